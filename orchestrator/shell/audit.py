@@ -0,0 +1,214 @@
+# Copyright 2026 GÉANT.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from orchestrator.core.db import (
+    ProcessSubscriptionTable,
+    ProcessTable,
+    ProductBlockTable,
+    ResourceTypeTable,
+    SubscriptionInstanceRelationTable,
+    SubscriptionInstanceTable,
+    SubscriptionInstanceValueTable,
+    SubscriptionTable,
+)
+from orchestrator.core.db.models import product_block_resource_type_association
+from orchestrator.core.types import SubscriptionLifecycle
+from orchestrator.core.workflow import ProcessStatus
+from sqlalchemy import CTE, ColumnElement, Engine, Row, Select, Subquery, and_, exists, func, literal, select
+from sqlalchemy.orm import Session, aliased
+from tabulate import tabulate
+
+from orchestrator.shell.database import active_database, read_engine, read_session
+from orchestrator.shell.state import state
+
+AUDIT_CHECKS = ["missing_values", "terminated_relations", "out_of_sync", "duplicate_values"]
+FINISHED_PROCESS_STATUSES = [ProcessStatus.COMPLETED, ProcessStatus.ABORTED]
+
+
+def missing_values_query() -> Select:
+    """Return query for resource types defined by the product block that have no value in the subscription."""
+    return (
+        select(
+            SubscriptionTable.subscription_id,
+            SubscriptionTable.description,
+            (ProductBlockTable.name + ": " + ResourceTypeTable.resource_type + " has no value").label("detail"),
+        )
+        .join(SubscriptionInstanceTable, SubscriptionTable.subscription_id == SubscriptionInstanceTable.subscription_id)
+        .join(ProductBlockTable, SubscriptionInstanceTable.product_block_id == ProductBlockTable.product_block_id)
+        .join(
+            product_block_resource_type_association,
+            ProductBlockTable.product_block_id == product_block_resource_type_association.c.product_block_id,
+        )
+        .join(
+            ResourceTypeTable,
+            product_block_resource_type_association.c.resource_type_id == ResourceTypeTable.resource_type_id,
+        )
+        .where(
+            SubscriptionTable.status != SubscriptionLifecycle.TERMINATED,
+            ~exists().where(
+                SubscriptionInstanceValueTable.subscription_instance_id
+                == SubscriptionInstanceTable.subscription_instance_id,
+                SubscriptionInstanceValueTable.resource_type_id == ResourceTypeTable.resource_type_id,
+            ),
+        )
+    )
+
+
+def terminated_relations_query() -> Select:
+    """Return query for product blocks of non-terminated subscriptions that depend on terminated subscriptions."""
+    in_use_by = aliased(SubscriptionInstanceTable)
+    depends_on = aliased(SubscriptionInstanceTable)
+    depends_on_subscription = aliased(SubscriptionTable)
+    return (
+        select(
+            SubscriptionTable.subscription_id,
+            SubscriptionTable.description,
+            ("depends on terminated subscription " + depends_on_subscription.description).label("detail"),
+        )
+        .join(in_use_by, SubscriptionTable.subscription_id == in_use_by.subscription_id)
+        .join(
+            SubscriptionInstanceRelationTable,
+            in_use_by.subscription_instance_id == SubscriptionInstanceRelationTable.in_use_by_id,
+        )
+        .join(depends_on, SubscriptionInstanceRelationTable.depends_on_id == depends_on.subscription_instance_id)
+        .join(depends_on_subscription, depends_on.subscription_id == depends_on_subscription.subscription_id)
+        .where(
+            SubscriptionTable.status != SubscriptionLifecycle.TERMINATED,
+            depends_on_subscription.status == SubscriptionLifecycle.TERMINATED,
+        )
+    )
+
+
+def out_of_sync_query() -> Select:
+    """Return query for active subscriptions that are not in sync while no process is working on them."""
+    return select(
+        SubscriptionTable.subscription_id,
+        SubscriptionTable.description,
+        literal("active and not in sync without unfinished process").label("detail"),
+    ).where(
+        SubscriptionTable.status == SubscriptionLifecycle.ACTIVE,
+        SubscriptionTable.insync.is_(False),
+        ~exists()
+        .where(ProcessSubscriptionTable.subscription_id == SubscriptionTable.subscription_id)
+        .where(
+            ProcessSubscriptionTable.process_id == ProcessTable.process_id,
+            ProcessTable.last_status.not_in(FINISHED_PROCESS_STATUSES),
+        ),
+    )
+
+
+def live_values_query(*where: ColumnElement[bool]) -> Select:
+    """Return query for the resource type values of subscriptions that are not terminated."""
+    return (
+        select(
+            SubscriptionInstanceTable.subscription_id,
+            SubscriptionInstanceValueTable.resource_type_id,
+            SubscriptionInstanceValueTable.value,
+        )
+        .join(
+            SubscriptionInstanceTable,
+            SubscriptionInstanceValueTable.subscription_instance_id
+            == SubscriptionInstanceTable.subscription_instance_id,
+        )
+        .join(SubscriptionTable, SubscriptionInstanceTable.subscription_id == SubscriptionTable.subscription_id)
+        .where(SubscriptionTable.status != SubscriptionLifecycle.TERMINATED, *where)
+    )
+
+
+def duplicates_query(live_values: CTE) -> Subquery:
+    """Return subquery for the resource type values that are used by more than one subscription."""
+    return (
+        select(live_values.c.resource_type_id, live_values.c.value)
+        .group_by(live_values.c.resource_type_id, live_values.c.value)
+        .having(func.count(live_values.c.subscription_id.distinct()) > 1)
+        .subquery("duplicates")
+    )
+
+
+def duplicate_values_query(unique_resource_types: list[str]) -> Select:
+    """Return query for values of resource types that should be unique, but are used by more than one subscription."""
+    live_values = live_values_query(
+        SubscriptionInstanceValueTable.resource_type_id.in_(
+            select(ResourceTypeTable.resource_type_id).where(ResourceTypeTable.resource_type.in_(unique_resource_types))
+        )
+    ).cte("live_values")
+    duplicates = duplicates_query(live_values)
+    return (
+        select(
+            SubscriptionTable.subscription_id,
+            SubscriptionTable.description,
+            (ResourceTypeTable.resource_type + " " + live_values.c.value + " is not unique").label("detail"),
+        )
+        .distinct()
+        .join(live_values, SubscriptionTable.subscription_id == live_values.c.subscription_id)
+        .join(
+            duplicates,
+            and_(
+                live_values.c.resource_type_id == duplicates.c.resource_type_id,
+                live_values.c.value == duplicates.c.value,
+            ),
+        )
+        .join(ResourceTypeTable, live_values.c.resource_type_id == ResourceTypeTable.resource_type_id)
+    )
+
+
+def audit_queries(checks: list[str], unique_resource_types: list[str]) -> dict[str, Select]:
+    """Return queries for the selected checks, the duplicate values check needs at least one unique resource type."""
+    queries = {
+        "missing_values": missing_values_query,
+        "terminated_relations": terminated_relations_query,
+        "out_of_sync": out_of_sync_query,
+    }
+    return {
+        check: duplicate_values_query(unique_resource_types) if check == "duplicate_values" else queries[check]()
+        for check in checks
+        if check != "duplicate_values" or unique_resource_types
+    }
+
+
+def run_check(engine: Engine, query: Select, limit: int) -> list[Row]:
+    """Run the query of a check in its own session on engine, so that checks can run concurrently."""
+    with Session(engine) as session:
+        columns = query.selected_columns
+        return list(session.execute(query.order_by(columns.description, columns.detail).limit(limit)))
+
+
+def audit(checks: list[str], unique_resource_types: list[str], limit: int) -> str:
+    """Implementation of the 'audit' command.
+
+    All checks are run concurrently, and the subscriptions with findings are added to the state in the same order as
+    they are listed, so that a finding can be selected with the 'subscription select' command.
+    """
+    queries = audit_queries(checks, unique_resource_types)
+    check = partial(run_check, read_engine(active_database()))
+    with ThreadPoolExecutor(max_workers=len(queries) or 1) as executor:
+        results = dict(zip(queries, executor.map(check, queries.values(), [limit] * len(queries)), strict=True))
+    findings = [(check, row) for check, rows in results.items() for row in rows]
+    subscriptions = {
+        subscription.subscription_id: subscription
+        for subscription in read_session().scalars(
+            select(SubscriptionTable)
+            .where(SubscriptionTable.subscription_id.in_({row.subscription_id for _, row in findings}))
+            .execution_options(populate_existing=True)
+        )
+    }
+    state.list_subscriptions([subscriptions[row.subscription_id] for _, row in findings])
+    return tabulate(
+        [(check, row.description, row.subscription_id, row.detail) for check, row in findings],
+        tablefmt="plain",
+        disable_numparse=True,
+        showindex=True,
+    )
@@ -0,0 +1,283 @@
+# Copyright 2026 GÉANT.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from threading import Thread, get_ident, main_thread
+from typing import Protocol, TypeVar, cast
+
+from orchestrator.core.db import db, wrapped_db
+from orchestrator.core.db.database import ENGINE_ARGUMENTS, BaseModel, Database, SearchQuery
+from orchestrator.core.settings import app_settings
+from sqlalchemy import Connection, Engine, Select, create_engine, event
+from sqlalchemy.engine import ExceptionContext
+from sqlalchemy.engine.interfaces import DBAPICursor
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
+from sqlalchemy.orm import Session, SessionTransaction, lazyload, object_session
+from sqlalchemy.orm.attributes import set_committed_value
+from structlog import get_logger
+
+from orchestrator.shell.settings import settings
+from orchestrator.shell.state import state
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+# SQLSTATE raised by FOR UPDATE NOWAIT when a row is locked by another transaction
+LOCK_NOT_AVAILABLE = "55P03"
+
+# name of the database that is connected to with DATABASE_URI
+DEFAULT_DATABASE = "default"
+
+# databases that were connected to, by name
+databases: dict[str, Database] = {}
+
+# engine and session on the read-only copy of the default database, by database name
+read_only_engines: dict[str, Engine] = {}
+read_only_sessions: dict[str, Session] = {}
+
+
+class CancellableConnection(Protocol):
+    """DBAPI connection that can cancel the statement it is executing, like a psycopg connection."""
+
+    def cancel_safe(self, *, timeout: float) -> None:
+        """Cancel the statement that is executing on the connection."""
+
+
+# engine, DBAPI connection and thread of every statement that is executing, by connection
+running_statements: dict[int, tuple[Engine, CancellableConnection, int]] = {}
+
+# engines on which a statement failed or was cancelled since the failures were last forgotten
+failed_engines: set[Engine] = set()
+
+
+def track_statement(connection: Connection, cursor: DBAPICursor, *_: object) -> None:
+    """Remember the connection and thread that execute the statement, so it can be cancelled."""
+    running_statements[id(connection)] = (connection.engine, cursor.connection, get_ident())  # type: ignore[attr-defined]
+
+
+def untrack_statement(connection: Connection, *_: object) -> None:
+    """Forget the backend process of a statement that finished."""
+    running_statements.pop(id(connection), None)
+
+
+def untrack_failed_statement(context: ExceptionContext) -> None:
+    """Forget the backend process of a statement that failed, and remember the engine it failed on."""
+    running_statements.pop(id(context.connection), None)
+    if context.engine is not None:
+        failed_engines.add(context.engine)
+
+
+def apply_statement_timeout(connection: Connection) -> None:
+    """Set the statement timeout for the rest of the transaction on connection."""
+    connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(settings.ORCHESTRATOR_SHELL_STATEMENT_TIMEOUT)}")
+
+
+def set_statement_timeout(_: Session, __: SessionTransaction, connection: Connection) -> None:
+    """Set the configured statement timeout at the start of every transaction."""
+    if settings.ORCHESTRATOR_SHELL_STATEMENT_TIMEOUT:
+        apply_statement_timeout(connection)
+
+
+def update_statement_timeout(*_: object) -> None:
+    """Apply a changed statement timeout to the transaction in progress, new transactions set it when they begin."""
+    if db.session.in_transaction():
+        apply_statement_timeout(db.session.connection())
+
+
+def install_event_listeners() -> None:
+    """Track running statements on all engines, and set the statement timeout on all sessions."""
+    event.listen(Engine, "before_cursor_execute", track_statement)
+    event.listen(Engine, "after_cursor_execute", untrack_statement)
+    event.listen(Engine, "handle_error", untrack_failed_statement)
+    event.listen(Session, "after_begin", set_statement_timeout)
+
+
+def cancel_connections(connections: list[tuple[Engine, CancellableConnection]]) -> None:
+    """Send a cancel request for the statement that is executing on each connection."""
+    for engine, connection in connections:
+        try:
+            connection.cancel_safe(timeout=5.0)
+        except engine.dialect.loaded_dbapi.Error as error:
+            logger.warning("Could not cancel statement.", error=str(error))
+
+
+def cancel_running_statements() -> bool:
+    """Cancel the statements running in worker threads, and return True if any statement was running.
+
+    This is called from the SIGINT handler. psycopg cancels the statement of an interrupted main thread itself, so only
+    statements in worker threads, like those of audit and search --all, are cancelled, from a separate thread so the
+    handler neither waits for the cancel requests nor touches the connection pools.
+    """
+    statements = list(running_statements.values())
+    failed_engines.update(engine for engine, _, _ in statements)
+    if workers := [(engine, connection) for engine, connection, thread in statements if thread != main_thread().ident]:
+        Thread(target=cancel_connections, args=(workers,), daemon=True).start()
+    return bool(statements)
+
+
+class RowLockedError(Exception):
+    """Raised when a row cannot be locked because another transaction holds a lock on it."""
+
+
+def select_for_update(statement: Select[tuple[T]]) -> T | None:
+    """Return the only result of statement, or None, after locking and refreshing its row from the database.
+
+    The row is locked with SELECT ... FOR UPDATE NOWAIT inside a savepoint, so a row that is locked by another
+    transaction fails fast without aborting the current transaction. The lock is held until the transaction ends.
+    Relationships are lazy loaded afterwards, eager loaders would lock the related rows as well.
+    """
+    try:
+        with db.session.begin_nested():
+            return db.session.scalars(
+                statement.with_for_update(nowait=True).options(lazyload("*")).execution_options(populate_existing=True)
+            ).one_or_none()
+    except OperationalError as error:
+        if getattr(error.orig, "sqlstate", getattr(error.orig, "pgcode", None)) == LOCK_NOT_AVAILABLE:
+            raise RowLockedError from error
+        raise
+
+
+def database_uris() -> dict[str, str]:
+    """Return URI of all configured databases by name, the default database is the one from DATABASE_URI."""
+    return {
+        DEFAULT_DATABASE: str(app_settings.DATABASE_URI.get_secret_value()),
+        **settings.ORCHESTRATOR_SHELL_DATABASES,
+    }
+
+
+def init_databases() -> None:
+    """Register the database initialised by orchestrator-core as the default and active database."""
+    databases[DEFAULT_DATABASE] = cast(Database, wrapped_db.wrapped_database)
+
+
+def get_database(name: str) -> Database:
+    """Return database by name, its engine is created at first use."""
+    if name not in databases:
+        databases[name] = Database(database_uris()[name])
+        # creating a database points the query property of all models to it, point it back to the active database
+        BaseModel.set_query(cast(SearchQuery, db.scoped_session.query_property()))
+    return databases[name]
+
+
+def active_database() -> str:
+    """Return name of the database that is connected to."""
+    return next(name for name, database in databases.items() if database is wrapped_db.wrapped_database)
+
+
+def database_list() -> str:
+    """Return list of configured databases, with the database that is connected to marked."""
+    active = active_database()
+    return "\n".join(f"{'*' if name == active else ' '} {name}" for name in database_uris())
+
+
+def connect(name: str) -> str:
+    """Implementation of the 'connect' command.
+
+    All loaded subscriptions, processes and the navigation history belong to the previous database and are forgotten.
+    """
+    if name not in database_uris():
+        return f"ERROR: unknown database {name}, choose from: {', '.join(database_uris())}"
+    database = get_database(name)
+    # close the session of the previous database, so it does not stay idle in transaction
+    db.scoped_session.remove()
+    wrapped_db.update(database)
+    BaseModel.set_query(cast(SearchQuery, database.scoped_session.query_property()))
+    state.reset()
+    return f"connected to database {name}"
+
+
+def use_read_only_database(name: str | None = None) -> bool:
+    """Return True when reads from database name, by default the connected database, go to the read-only database.
+
+    A read-only database is only used for the default database, and not when the shell is pinned to the primary.
+    """
+    return (
+        bool(settings.ORCHESTRATOR_SHELL_READ_ONLY_DATABASE_URI)
+        and not settings.ORCHESTRATOR_SHELL_PIN_PRIMARY
+        and (name or active_database()) == DEFAULT_DATABASE
+    )
+
+
+def read_only_engine() -> Engine:
+    """Return the engine on the read-only database, created at first use, that only allows read-only transactions."""
+    if DEFAULT_DATABASE not in read_only_engines:
+        read_only_engines[DEFAULT_DATABASE] = create_engine(
+            str(settings.ORCHESTRATOR_SHELL_READ_ONLY_DATABASE_URI), **ENGINE_ARGUMENTS
+        ).execution_options(postgresql_readonly=True)
+    return read_only_engines[DEFAULT_DATABASE]
+
+
+def read_only_session() -> Session:
+    """Return the session on the read-only database, created at first use.
+
+    Loaded objects are not expired when a transaction ends, queries that list objects again use populate_existing
+    to refresh them.
+    """
+    if DEFAULT_DATABASE not in read_only_sessions:
+        read_only_sessions[DEFAULT_DATABASE] = Session(read_only_engine(), autoflush=False, expire_on_commit=False)
+    return read_only_sessions[DEFAULT_DATABASE]
+
+
+def read_session() -> Session:
+    """Return the session for list, search, stats and export queries, on the read-only database when it is used."""
+    return read_only_session() if use_read_only_database() else db.session
+
+
+def read_engine(name: str) -> Engine:
+    """Return the engine for reads from database name, on the read-only database when it is used."""
+    return read_only_engine() if use_read_only_database(name) else get_database(name).engine
+
+
+def expire_attribute(instance: object, attribute: str) -> None:
+    """Expire attribute of instance in the session it was loaded in, so it is reloaded when it is used again."""
+    if (session := object_session(instance)) is not None:
+        session.expire(instance, [attribute])
+
+
+def show_updated_value(instance: object, updated: object, attribute: str, value: object) -> None:
+    """Show the new value of attribute on instance until it is reloaded, when updated is another copy of instance.
+
+    An instance that was read from the read-only database is not the locked object that was updated on the primary,
+    and would show the old value until it is reloaded.
+    """
+    if updated is not instance:
+        set_committed_value(instance, attribute, value)
+
+
+def failed_on_primary() -> bool:
+    """Return True when a statement failed or was cancelled on the connected database since the last command."""
+    return db.engine in failed_engines
+
+
+def forget_failures() -> None:
+    """Forget the engines on which statements failed or were cancelled."""
+    failed_engines.clear()
+
+
+def end_read_only_transaction() -> None:
+    """End the transaction on the read-only database, so a replica is not held back between commands.
+
+    A transaction that was aborted by a failed or cancelled statement, or whose connection was invalidated by an
+    interrupt, is rolled back instead, so the session can be used again.
+    """
+    for session in read_only_sessions.values():
+        try:
+            session.commit()
+        except SQLAlchemyError:
+            session.rollback()
+
+
+def expire_read_only_objects() -> None:
+    """Expire all objects loaded from the read-only database, so they are reloaded with their current values."""
+    for session in read_only_sessions.values():
+        session.expire_all()
@@ -0,0 +1,121 @@
+# Copyright 2026 GÉANT.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import re
+from collections.abc import Callable, Mapping, Sequence
+from typing import Any
+
+from orchestrator.core.db import db
+from sqlalchemy import Connection, event, text
+from sqlalchemy.engine.interfaces import DBAPICursor
+from sqlalchemy.exc import DBAPIError
+
+from orchestrator.shell.settings import settings
+from orchestrator.shell.transaction import transaction_begin, transaction_rollback
+
+LARGE_TABLE_ROWS = 10000
+
+# parameters as passed to the database driver
+Parameters = Mapping[str, Any] | Sequence[Any]
+
+# only these statements can be explained, transaction control and SET statements are skipped
+EXPLAINABLE = re.compile(r"^\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b", flags=re.IGNORECASE)
+SEQUENTIAL_SCAN = re.compile(r"Seq Scan on (\S+)")
+
+
+def table_rows(connection: Connection, table: str, cache: dict[str, int]) -> int:
+    """Return the estimated number of live rows in table, looked up once per table."""
+    if table not in cache:
+        cache[table] = (
+            connection.execute(
+                text("SELECT n_live_tup FROM pg_stat_all_tables WHERE relid = to_regclass(:table)"), {"table": table}
+            ).scalar()
+            or 0
+        )
+    return cache[table]
+
+
+def mark_sequential_scans(
+    connection: Connection, plan: list[str], large_table_rows: int, cache: dict[str, int]
+) -> list[str]:
+    """Return plan lines with sequential scans on tables of at least large_table_rows rows marked."""
+    marked = []
+    for line in plan:
+        if (scan := SEQUENTIAL_SCAN.search(line)) and (
+            rows := table_rows(connection, scan.group(1), cache)
+        ) >= large_table_rows:
+            line = f"{line}  <== sequential scan on large table ({rows} rows)"
+        marked.append(line)
+    return marked
+
+
+def explain_statement(connection: Connection, statement: str, parameters: Parameters) -> list[str]:
+    """Return the EXPLAIN (ANALYZE, BUFFERS) plan lines of statement executed with parameters.
+
+    The statement runs in a savepoint, so a statement that fails does not abort the transaction.
+    """
+    try:
+        with connection.begin_nested():
+            return list(connection.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS) {statement}", parameters).scalars())
+    except DBAPIError as error:
+        return [f"ERROR: {error.orig}"]
+
+
+def explain_report(statements: list[tuple[str, Parameters]], large_table_rows: int) -> str:
+    """Return the statements together with their query plans."""
+    connection = db.session.connection()
+    cache: dict[str, int] = {}
+    report = []
+    for number, (statement, parameters) in enumerate(statements, start=1):
+        plan = explain_statement(connection, statement, parameters)
+        report += [
+            f"Statement {number} of {len(statements)}:",
+            statement,
+            f"parameters: {parameters}",
+            "",
+            *mark_sequential_scans(connection, plan, large_table_rows, cache),
+            "",
+        ]
+    return "\n".join(report) if report else "No SQL statements executed."
+
+
+def explain(func: Callable[[], Any], large_table_rows: int = LARGE_TABLE_ROWS) -> tuple[Any, str]:
+    """Run func in a transaction that is rolled back, and return its result together with the plans of its statements.
+
+    Every explainable statement that is sent to the database while func runs is captured, and explained with
+    EXPLAIN (ANALYZE, BUFFERS) in the same transaction, before the transaction is rolled back. Queries are pinned to
+    the primary database while func runs, so reads that would go to the read-only database are captured as well.
+    """
+    statements: list[tuple[str, Parameters]] = []
+
+    def capture(
+        _: Connection, __: DBAPICursor, statement: str, parameters: Parameters, ___: object, executemany: bool
+    ) -> None:
+        if not executemany and EXPLAINABLE.match(statement):
+            statements.append((statement, parameters))
+
+    pin_primary = settings.ORCHESTRATOR_SHELL_PIN_PRIMARY
+    transaction_begin()
+    try:
+        event.listen(db.engine, "before_cursor_execute", capture)
+        settings.ORCHESTRATOR_SHELL_PIN_PRIMARY = True
+        try:
+            result = func()
+            # updates are staged in the session while commit is disabled, flush them to capture their statements
+            db.session.flush()
+        finally:
+            settings.ORCHESTRATOR_SHELL_PIN_PRIMARY = pin_primary
+            event.remove(db.engine, "before_cursor_execute", capture)
+        return result, explain_report(statements, large_table_rows)
+    finally:
+        transaction_rollback()
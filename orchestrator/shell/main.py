@@ -11,26 +11,105 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from argparse import Namespace
+from argparse import REMAINDER, ArgumentParser, ArgumentTypeError, Namespace
+from collections.abc import Callable
 from datetime import datetime
+from math import isfinite
+from pathlib import Path
+from types import FrameType
 
-from cmd2 import Cmd, Cmd2ArgumentParser, Statement, with_argparser
+from cmd2 import Cmd, Cmd2ArgumentParser, Settable, Statement, with_argparser
 from orchestrator.core.db import init_database
 from orchestrator.core.services.processes import RESUMABLE_STATUSES
 from orchestrator.core.settings import app_settings
-
+from orchestrator.core.types import SubscriptionLifecycle
+from orchestrator.core.workflow import ProcessStatus
+from sqlalchemy.exc import DataError, DBAPIError
+
+import orchestrator.shell.audit
+import orchestrator.shell.database
+import orchestrator.shell.explain
+import orchestrator.shell.navigation
 import orchestrator.shell.process
 import orchestrator.shell.product_block
+import orchestrator.shell.profiling
 import orchestrator.shell.resource_type
 import orchestrator.shell.subscripition
+import orchestrator.shell.transaction
+from orchestrator.shell.audit import AUDIT_CHECKS
+from orchestrator.shell.database import DEFAULT_DATABASE
+from orchestrator.shell.explain import LARGE_TABLE_ROWS
+from orchestrator.shell.output import OUTPUT_FORMATS
+from orchestrator.shell.process import WATCH_MINIMUM_INTERVAL
 from orchestrator.shell.settings import settings
 from orchestrator.shell.state import state
+from orchestrator.shell.subscripition import STATS_BUCKETS, STATS_GROUP_BY, SubscriptionFilter
+
+
+def boolean(value: str) -> bool:
+    """Return boolean for y, yes, true, n, no or false."""
+    if value.lower() in ["y", "yes", "true"]:
+        return True
+    if value.lower() in ["n", "no", "false"]:
+        return False
+    raise ArgumentTypeError("expected y, yes, true, n, no or false")
+
+
+def timestamp(value: str) -> datetime:
+    """Return timezone aware datetime for ISO formatted date and time, using the local timezone when none is given."""
+    try:
+        return datetime.fromisoformat(value).astimezone()
+    except ValueError as value_error:
+        raise ArgumentTypeError(str(value_error)) from value_error
+
+
+def interval(value: str) -> float:
+    """Return number of seconds for value, which must be at least the minimum interval between polls."""
+    try:
+        seconds = float(value)
+    except ValueError as value_error:
+        raise ArgumentTypeError(str(value_error)) from value_error
+    if not (isfinite(seconds) and seconds >= WATCH_MINIMUM_INTERVAL):
+        raise ArgumentTypeError(f"expected at least {WATCH_MINIMUM_INTERVAL} seconds")
+    return seconds
+
+
+def non_negative_int(value: str) -> int:
+    """Return integer for value, rejecting negative numbers so a settable keeps its previous value."""
+    if (number := int(value)) < 0:
+        raise ValueError(f"expected 0 or more, got {number}")
+    return number
+
+
+def add_subscription_filter_arguments(parser: ArgumentParser) -> None:
+    """Add arguments to parser to filter subscriptions in the database query."""
+    parser.add_argument("--status", choices=[status.value for status in SubscriptionLifecycle], help="match status")
+    parser.add_argument("--product", type=str, help="match product name or tag")
+    parser.add_argument("--customer-id", type=str, help="match customer ID")
+    parser.add_argument("--insync", type=boolean, help="match insync (y, yes, true, n, no or false)")
+    parser.add_argument("--start-after", type=timestamp, help="match start date after ISO date/time")
+    parser.add_argument("--end-before", type=timestamp, help="match end date before ISO date/time")
+
+
+def subscription_filter(args: Namespace, regular_expression: str | None) -> SubscriptionFilter:
+    """Return subscription filter from the parsed filter arguments."""
+    return SubscriptionFilter(
+        regular_expression=regular_expression,
+        status=args.status,
+        product=args.product,
+        customer_id=args.customer_id,
+        insync=args.insync,
+        start_after=args.start_after,
+        end_before=args.end_before,
+    )
 
 
 class OrchestratorShell(Cmd):
     """WorkFlow Orchestrator shell."""
 
     intro = "Welcome to the WFO shell.\nType help or ? to list commands."
+    default_prompt = "(wfo) "
+    transaction_prompt = "(wfo*) "
 
     def __init__(self) -> None:
         """WFO shell initialization."""
@@ -38,23 +117,237 @@ class OrchestratorShell(Cmd):
             persistent_history_file=str(settings.ORCHESTRATOR_SHELL_HISTFILE),
             persistent_history_length=settings.ORCHESTRATOR_SHELL_HISTFILE_SIZE,
         )
-        self.prompt = "(wfo) "
+        self.prompt = self.default_prompt
         self.hidden_commands.extend(["alias", "edit", "macro", "run_pyscript", "run_script", "shell", "shortcuts"])
+        self.profile = False
+        self.profile_limit = 20
+        self.add_settable(Settable("profile", bool, "Profile every command with cProfile and tracemalloc", self))
+        self.add_settable(Settable("profile_limit", int, "Number of functions and allocations to profile", self))
+        self.profiling = False
+        self.pstats_file: Path | None = None
+        self.add_settable(
+            Settable(
+                "statement_timeout",
+                non_negative_int,
+                "Cancel database statements that take longer than this many milliseconds, 0 disables",
+                settings,
+                settable_attrib_name="ORCHESTRATOR_SHELL_STATEMENT_TIMEOUT",
+                onchange_cb=orchestrator.shell.database.update_statement_timeout,
+            )
+        )
+        self.statement_cancelled = False
+        self.add_settable(
+            Settable(
+                "output",
+                str,
+                "Output format of lists and details: table, or json and jsonl for machine readable output",
+                settings,
+                settable_attrib_name="ORCHESTRATOR_SHELL_OUTPUT",
+                choices=OUTPUT_FORMATS,
+            )
+        )
+        self.add_settable(
+            Settable(
+                "pin_primary",
+                bool,
+                "Send all queries to the primary database, also when a read-only database is configured",
+                settings,
+                settable_attrib_name="ORCHESTRATOR_SHELL_PIN_PRIMARY",
+            )
+        )
         init_database(app_settings)  # type: ignore[arg-type]
+        orchestrator.shell.database.install_event_listeners()
+        orchestrator.shell.database.init_databases()
+
+    def sigint_handler(self, signum: int, frame: FrameType | None) -> None:
+        """Cancel running database statements before interrupting the command."""
+        if orchestrator.shell.database.cancel_running_statements():
+            self.statement_cancelled = True
+        super().sigint_handler(signum, frame)
+
+    def abort_transaction(self) -> None:
+        """Roll back the session after a database error or cancelled statement, so the next command can use it.
+
+        Nothing is rolled back when the statement failed on the read-only database, staged updates are kept then.
+        """
+        if not orchestrator.shell.database.failed_on_primary():
+            return
+        if orchestrator.shell.transaction.transaction_abort():
+            self.pwarning("transaction rolled back, staged updates are lost")
+
+    def profiled(self, func: Callable[[], bool], pstats_file: Path | None = None) -> bool:
+        """Run func under the profiler, unless already profiling, and show the profile report.
+
+        When already profiling, the pstats file is written by the profile run that is in progress.
+        """
+        if self.profiling:
+            self.pstats_file = pstats_file or self.pstats_file
+            return func()
+        self.profiling = True
+        self.pstats_file = pstats_file
+        try:
+            stop, report = orchestrator.shell.profiling.profile(func, self.profile_limit, lambda: self.pstats_file)
+        finally:
+            self.profiling = False
+        self.perror(report, style=None)
+        return stop
+
+    def onecmd(self, statement: Statement | str, *, add_to_history: bool = True) -> bool:
+        """Execute command, profiled when the profile setting is enabled, and clean up after database errors.
+
+        The read-only transaction is ended after every command, also when it failed, so the next command reads recent
+        replicated data.
+        """
+        try:
+            if self.profile:
+                return self.profiled(
+                    lambda: super(OrchestratorShell, self).onecmd(statement, add_to_history=add_to_history)
+                )
+            return super().onecmd(statement, add_to_history=add_to_history)
+        except DBAPIError:
+            self.abort_transaction()
+            raise
+        finally:
+            if self.statement_cancelled:
+                self.statement_cancelled = False
+                self.pwarning("database statement cancelled")
+                self.abort_transaction()
+            orchestrator.shell.database.end_read_only_transaction()
+            orchestrator.shell.database.forget_failures()
+
+    def postcmd(self, stop: bool, statement: Statement | str) -> bool:  # noqa: ARG002
+        """Show in the prompt whether an explicit transaction is in progress, and which database is connected to."""
+        in_transaction = orchestrator.shell.transaction.in_transaction()
+        self.prompt = self.transaction_prompt if in_transaction else self.default_prompt
+        if (database := orchestrator.shell.database.active_database()) != DEFAULT_DATABASE:
+            self.prompt = self.prompt.replace("wfo", f"wfo:{database}", 1)
+        return stop
+
+    # quit and end of input command argument parsers
+    quit_parser = Cmd2ArgumentParser(description="Exit the application, unless a transaction is in progress.")
+    eof_parser = Cmd2ArgumentParser(description="Called when Ctrl-D is pressed or the input ends.")
+
+    @with_argparser(quit_parser)
+    def do_quit(self, _: Namespace) -> bool:
+        """Exit the application, unless a transaction is in progress."""
+        if orchestrator.shell.transaction.in_transaction():
+            self.pwarning("commit or rollback the current transaction first")
+            self.last_result = False
+            return False
+        self.last_result = True
+        return True
+
+    @with_argparser(eof_parser)
+    def do__eof(self, _: Namespace) -> bool:
+        """Quit when Ctrl-D is pressed, or at the end of input that is not read from a terminal.
+
+        Without a terminal there is no way to commit or rollback anymore, so the transaction is rolled back then.
+        """
+        self.poutput()
+        if not self.stdin.isatty() and orchestrator.shell.transaction.in_transaction():
+            orchestrator.shell.transaction.transaction_rollback()
+            self.pwarning("end of input, transaction rolled back, staged updates are lost")
+        return bool(self.do_quit(""))
 
     def do_exit(self, _: Statement) -> bool:
         """Exit the application."""
-        return True
+        return bool(self.do_quit(""))
+
+    # connect command argument parser
+    connect_parser = Cmd2ArgumentParser()
+    connect_parser.add_argument("database", nargs="?", help="name of the database to connect to")
+
+    # connect command
+    @with_argparser(connect_parser)
+    def do_connect(self, args: Namespace) -> None:
+        """Connect to another configured database, or list the configured databases."""
+        if args.database is None:
+            self.poutput(orchestrator.shell.database.database_list())
+        elif orchestrator.shell.transaction.in_transaction():
+            self.pwarning("commit or rollback the current transaction first")
+        else:
+            self.poutput(orchestrator.shell.database.connect(args.database))
+
+    def do_begin(self, _: Statement) -> None:
+        """Begin a transaction, updates are staged until commit or rollback."""
+        if orchestrator.shell.transaction.in_transaction():
+            self.pwarning("already in a transaction")
+        else:
+            orchestrator.shell.transaction.transaction_begin()
+
+    def do_commit(self, _: Statement) -> None:
+        """Commit all updates staged since begin."""
+        if not orchestrator.shell.transaction.in_transaction():
+            self.pwarning("not in a transaction, use begin first")
+        else:
+            orchestrator.shell.transaction.transaction_commit()
+
+    def do_rollback(self, _: Statement) -> None:
+        """Discard all updates staged since begin."""
+        if not orchestrator.shell.transaction.in_transaction():
+            self.pwarning("not in a transaction, use begin first")
+        else:
+            orchestrator.shell.transaction.transaction_rollback()
+
+    # profile command argument parser
+    profile_parser = Cmd2ArgumentParser()
+    profile_parser.add_argument("--pstats", type=Path, help="also write profile to pstats file")
+    profile_parser.add_argument("command", nargs=REMAINDER, help="command to profile")
+
+    # profile command
+    @with_argparser(profile_parser, preserve_quotes=True)
+    def do_profile(self, args: Namespace) -> bool:
+        """Run command with cProfile and tracemalloc, and show top functions and allocation sites."""
+        if not args.command:
+            self.do_help("profile")
+            return False
+        return self.profiled(lambda: self.onecmd_plus_hooks(" ".join(args.command)), args.pstats)
+
+    # explain command argument parser
+    explain_parser = Cmd2ArgumentParser()
+    explain_parser.add_argument(
+        "--rows",
+        type=int,
+        default=LARGE_TABLE_ROWS,
+        help=f"mark sequential scans on tables with at least this many rows (default {LARGE_TABLE_ROWS})",
+    )
+    explain_parser.add_argument("command", nargs=REMAINDER, help="command to explain")
+
+    # explain command
+    @with_argparser(explain_parser, preserve_quotes=True)
+    def do_explain(self, args: Namespace) -> bool:
+        """Run command in a rolled back transaction and show the query plans of its SQL statements."""
+        if not args.command:
+            self.do_help("explain")
+            return False
+        if orchestrator.shell.transaction.in_transaction():
+            self.pwarning("explain rolls back all updates, first commit or rollback the transaction")
+            return False
+        stop, report = orchestrator.shell.explain.explain(
+            lambda: self.onecmd_plus_hooks(" ".join(args.command)), args.rows
+        )
+        self.poutput(report)
+        return stop
 
     # subcommand functions for the subscription command
-    def subscription_list(self, _: Namespace) -> None:
+    def subscription_list(self, args: Namespace) -> None:
         """List subcommand of subscription command."""
         self.pfeedback("INFO: Listing only the ten most recent subscriptions. Use search to find more.")
-        self.poutput(orchestrator.shell.subscripition.subscription_list())
+        self.poutput(orchestrator.shell.subscripition.subscription_list(subscription_filter(args, None)))
 
     def subscription_search(self, args: Namespace) -> None:
         """Search subcommand of subscription command."""
-        self.poutput(orchestrator.shell.subscripition.subscription_search(args.regular_expression))
+        if args.all:
+            self.poutput(
+                orchestrator.shell.subscripition.subscription_search_all(
+                    subscription_filter(args, args.regular_expression)
+                )
+            )
+            self.pfeedback("INFO: Use 'connect <database>' to select a subscription from another database.")
+            return
+        self.poutput(
+            orchestrator.shell.subscripition.subscription_search(subscription_filter(args, args.regular_expression))
+        )
 
     def subscription_select(self, args: Namespace) -> None:
         """Select subcommand of subscription command."""
@@ -103,15 +396,42 @@ class OrchestratorShell(Cmd):
                     return
                 if args.new_value.tzinfo is None:
                     args.new_value = args.new_value.astimezone()
-        orchestrator.shell.subscripition.subscription_update(args.field, args.new_value)
+        if warning := orchestrator.shell.subscripition.subscription_update(args.field, args.new_value):
+            self.pwarning(warning)
+
+    def subscription_export(self, args: Namespace) -> None:
+        """Export subcommand of subscription command."""
+        try:
+            number_of_subscriptions = orchestrator.shell.subscripition.subscription_export(
+                args.file, args.format, subscription_filter(args, args.search)
+            )
+        except OSError as os_error:
+            self.pwarning(str(os_error))
+        except DataError as data_error:
+            self.pwarning(f"ERROR: {data_error.orig}")
+        else:
+            self.pfeedback(f"INFO: Exported {number_of_subscriptions} subscription(s) to {args.file}")
+
+    def subscription_stats(self, args: Namespace) -> None:
+        """Stats subcommand of subscription command."""
+        if not args.refresh and (args.by, args.bucket) in state.subscription_stats:
+            self.pfeedback("INFO: Showing statistics cached in this session. Use --refresh to update.")
+        self.poutput(orchestrator.shell.subscripition.subscription_stats(args.by, args.bucket, args.refresh))
 
     # subscription (sub)commands argument parsers
     s_parser = Cmd2ArgumentParser()
     s_subparser = s_parser.add_subparsers(title="subscription subcommands")
     s_list_parser = s_subparser.add_parser("list", help="list all subscriptions from database")
+    add_subscription_filter_arguments(s_list_parser)
     s_list_parser.set_defaults(func=subscription_list)
     s_search_parser = s_subparser.add_parser("search", help="case insensitive search subscription descriptions")
-    s_search_parser.add_argument("regular_expression", type=str, help="match description on regular expression")
+    s_search_parser.add_argument(
+        "regular_expression", type=str, nargs="?", help="match description on regular expression"
+    )
+    s_search_parser.add_argument(
+        "--all", action="store_true", help="search all configured databases concurrently, list only"
+    )
+    add_subscription_filter_arguments(s_search_parser)
     s_search_parser.set_defaults(func=subscription_search)
     s_select_parser = s_subparser.add_parser("select", help="select subscription to work on")
     s_select_parser.add_argument("index", type=int, help="select by index number")
@@ -136,6 +456,19 @@ class OrchestratorShell(Cmd):
     )
     s_update_parser.add_argument("new_value", type=str, help="new value for selected subscription field")
     s_update_parser.set_defaults(func=subscription_update)
+    s_export_parser = s_subparser.add_parser(
+        "export", help="export subscriptions with product blocks and resource types to file"
+    )
+    s_export_parser.add_argument("--search", type=str, help="only export subscriptions matching regular expression")
+    add_subscription_filter_arguments(s_export_parser)
+    s_export_parser.add_argument("--format", choices=["jsonl", "csv"], default="jsonl", help="export file format")
+    s_export_parser.add_argument("file", type=Path, help="file to export to")
+    s_export_parser.set_defaults(func=subscription_export)
+    s_stats_parser = s_subparser.add_parser("stats", help="count subscriptions and subscriptions not in sync")
+    s_stats_parser.add_argument("--by", choices=list(STATS_GROUP_BY), default="product", help="group subscriptions by")
+    s_stats_parser.add_argument("--bucket", choices=STATS_BUCKETS, help="also group on start date per period")
+    s_stats_parser.add_argument("--refresh", action="store_true", help="update statistics cached in this session")
+    s_stats_parser.set_defaults(func=subscription_stats)
 
     # subscription command
     @with_argparser(s_parser)
@@ -257,8 +590,28 @@ class OrchestratorShell(Cmd):
         """Update subcommand of resource_type command."""
         if state.resource_type_index is None:
             self.pwarning("first select a resource_type")
-        else:
-            orchestrator.shell.resource_type.resource_type_update(args.new_value)
+        elif warning := orchestrator.shell.resource_type.resource_type_update(args.new_value):
+            self.pwarning(warning)
+
+    def resource_type_usage(self, args: Namespace) -> None:
+        """Usage subcommand of resource_type command."""
+        self.poutput(
+            orchestrator.shell.resource_type.resource_type_usage(
+                args.resource_type, args.duplicates, args.numeric_gaps, args.limit
+            )
+        )
+        if args.duplicates:
+            self.pfeedback("INFO: Use 'subscription select' with the index of a value to select its subscription.")
+
+    def resource_type_apply(self, args: Namespace) -> None:
+        """Apply subcommand of resource_type command."""
+        if args.chunk_size < 1:
+            self.pwarning("chunk size should be at least 1")
+            return
+        try:
+            self.poutput(orchestrator.shell.resource_type.resource_type_apply(args.file, args.chunk_size, args.dry_run))
+        except (OSError, ValueError) as error:
+            self.pwarning(str(error))
 
     # resource_type (sub)commands argument parsers
     rt_parser = Cmd2ArgumentParser()
@@ -273,6 +626,30 @@ class OrchestratorShell(Cmd):
     rt_update_parser = rt_subparser.add_parser("update", help="update selected resource type")
     rt_update_parser.add_argument("new_value", type=str, help="new value for selected resource type")
     rt_update_parser.set_defaults(func=resource_type_update)
+    rt_usage_parser = rt_subparser.add_parser("usage", help="show how the values of a resource type are used")
+    rt_usage_parser.add_argument("resource_type", type=str, help="name of the resource type")
+    rt_usage_group = rt_usage_parser.add_mutually_exclusive_group()
+    rt_usage_group.add_argument(
+        "--duplicates", action="store_true", help="list values used by more than one subscription"
+    )
+    rt_usage_group.add_argument(
+        "--numeric-gaps", action="store_true", help="list free ranges between the numeric values in use"
+    )
+    rt_usage_parser.add_argument("--limit", type=int, default=20, help="maximum number of rows (default 20)")
+    rt_usage_parser.set_defaults(func=resource_type_usage)
+    rt_apply_parser = rt_subparser.add_parser(
+        "apply", help="apply resource type values from CSV or JSON Lines file to many subscriptions"
+    )
+    rt_apply_parser.add_argument(
+        "file",
+        type=Path,
+        help="CSV or JSON Lines (.jsonl) file with subscription_id, product_block, resource_type and value fields",
+    )
+    rt_apply_parser.add_argument("--dry-run", action="store_true", help="only show what would be applied")
+    rt_apply_parser.add_argument(
+        "--chunk-size", type=int, default=1000, help="number of changes per commit (default: 1000)"
+    )
+    rt_apply_parser.set_defaults(func=resource_type_apply)
 
     # resource_type command
     @with_argparser(rt_parser)
@@ -310,6 +687,53 @@ class OrchestratorShell(Cmd):
         else:
             self.do_help("state")
 
+    # audit command argument parser
+    audit_parser = Cmd2ArgumentParser()
+    audit_parser.add_argument(
+        "--check",
+        action="append",
+        choices=AUDIT_CHECKS,
+        help="only run this check, can be repeated (default: all checks)",
+    )
+    audit_parser.add_argument(
+        "--unique",
+        action="append",
+        metavar="RESOURCE_TYPE",
+        help="resource type that should have unique values, can be repeated "
+        "(default: ORCHESTRATOR_SHELL_UNIQUE_RESOURCE_TYPES)",
+    )
+    audit_parser.add_argument("--limit", type=int, default=100, help="maximum number of findings per check")
+
+    # audit command
+    @with_argparser(audit_parser)
+    def do_audit(self, args: Namespace) -> None:
+        """Check all subscriptions for inconsistencies and list the findings."""
+        unique_resource_types = args.unique or settings.ORCHESTRATOR_SHELL_UNIQUE_RESOURCE_TYPES
+        checks = args.check or AUDIT_CHECKS
+        if "duplicate_values" in checks and not unique_resource_types:
+            self.pfeedback("INFO: Skipping duplicate_values check, no unique resource types configured.")
+        self.poutput(orchestrator.shell.audit.audit(checks, unique_resource_types, args.limit))
+        if state.subscriptions:
+            self.pfeedback("INFO: Use 'subscription select' with the index of a finding to select its subscription.")
+
+    def do_back(self, _: Statement) -> None:
+        """Go back to the previously selected subscription, product block or resource type."""
+        if state.history_index < 1:
+            self.pwarning("no previous selection to go back to")
+        else:
+            self.poutput(orchestrator.shell.navigation.navigation_back())
+
+    def do_forward(self, _: Statement) -> None:
+        """Go forward to the next selected subscription, product block or resource type."""
+        if state.history_index >= len(state.history) - 1:
+            self.pwarning("no next selection to go forward to")
+        else:
+            self.poutput(orchestrator.shell.navigation.navigation_forward())
+
+    def do_jumps(self, _: Statement) -> None:
+        """List selected subscriptions, product blocks and resource types that can be navigated to."""
+        self.poutput(orchestrator.shell.navigation.navigation_jumps())
+
     # subcommand functions for the process command
     def process_list(self, _: Namespace) -> None:
         """List subcommand of process command."""
@@ -318,7 +742,13 @@ class OrchestratorShell(Cmd):
 
     def process_search(self, args: Namespace) -> None:
         """Search subcommand of process command."""
-        self.poutput(orchestrator.shell.process.process_search(args.regular_expression))
+        if args.stats is not None and not 0 <= args.stats < len(state.process_stats):
+            if not state.process_stats:
+                self.pwarning("show process stats first")
+            else:
+                self.pwarning(f"selected stats index not between 0 and {len(state.process_stats) - 1}")
+        else:
+            self.poutput(orchestrator.shell.process.process_search(args.regular_expression, args.stats))
 
     def process_select(self, args: Namespace) -> None:
         """Select subcommand of process command."""
@@ -339,6 +769,21 @@ class OrchestratorShell(Cmd):
         else:
             self.poutput(orchestrator.shell.process.process_details())
 
+    def process_watch(self, args: Namespace) -> None:
+        """Watch subcommand of process command."""
+        self.pfeedback("INFO: Watching for new or changed processes. Press Ctrl-C to stop.")
+        try:
+            for processes in orchestrator.shell.process.process_watch(args.status or [], args.interval):
+                self.poutput(processes)
+        except KeyboardInterrupt:
+            self.pfeedback(f"INFO: Stopped watching, {len(state.processes)} new or changed process(es) found.")
+            self.poutput(orchestrator.shell.process.indexed_process_list(state.processes))
+
+    def process_stats(self, args: Namespace) -> None:
+        """Stats subcommand of process command."""
+        self.poutput(orchestrator.shell.process.process_stats(args.since))
+        self.pfeedback("INFO: Use 'process search --stats <index>' to search the processes of a row.")
+
     def process_leapfrog(self, _: Namespace) -> None:
         """Leapfrog subcommand of process command."""
         if state.process_index is None:
@@ -358,12 +803,33 @@ class OrchestratorShell(Cmd):
         "search", help="case insensitive search process by workflow name or created by"
     )
     process_search_parser.add_argument(
-        "regular_expression", type=str, help="match process workflow name on regular expression"
+        "regular_expression", type=str, nargs="?", default="", help="match process workflow name on regular expression"
+    )
+    process_search_parser.add_argument(
+        "--stats", type=int, metavar="INDEX", help="only search processes counted in this row of process stats"
     )
     process_search_parser.set_defaults(func=process_search)
     process_select_parser = process_subparser.add_parser("select", help="select process to work on")
     process_select_parser.add_argument("index", type=int, help="select by index number")
     process_select_parser.set_defaults(func=process_select)
+    process_watch_parser = process_subparser.add_parser("watch", help="show new or changed processes until Ctrl-C")
+    process_watch_parser.add_argument(
+        "--status",
+        action="append",
+        choices=[status.value for status in ProcessStatus],
+        help="only show processes with this status, can be repeated",
+    )
+    process_watch_parser.add_argument(
+        "--interval", type=interval, default=2.0, help="seconds between polls of the database (default: 2)"
+    )
+    process_watch_parser.set_defaults(func=process_watch)
+    process_stats_parser = process_subparser.add_parser(
+        "stats", help="count processes per workflow, status and last step, and failed steps"
+    )
+    process_stats_parser.add_argument(
+        "--since", type=timestamp, help="only count processes modified since ISO date/time"
+    )
+    process_stats_parser.set_defaults(func=process_stats)
     process_leapfrog_parser = process_subparser.add_parser(
         "leapfrog", help="leapfrog a failed process forward by one step"
     )
@@ -0,0 +1,63 @@
+# Copyright 2026 GÉANT.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from tabulate import tabulate
+
+from orchestrator.shell.state import (
+    Position,
+    all_resource_types,
+    sorted_product_blocks,
+    sorted_resource_types,
+    state,
+)
+
+
+def jump(position: Position) -> tuple[str, str, str]:
+    """Return names of the subscription, product block and resource type selected at position."""
+    subscription = product_block = resource_type = ""
+    if position.subscription_index is not None:
+        selected_subscription = position.subscriptions[position.subscription_index]
+        subscription = selected_subscription.description
+        if position.product_block_index is not None:
+            selected_product_block = sorted_product_blocks(selected_subscription.instances)[
+                position.product_block_index
+            ]
+            product_block = selected_product_block.product_block.name
+            if position.resource_type_index is not None:
+                resource_types = sorted_resource_types(all_resource_types(selected_product_block))
+                resource_type = resource_types[position.resource_type_index].resource_type.resource_type
+    return subscription, product_block, resource_type
+
+
+def navigation_back() -> str:
+    """Implementation of the 'back' command."""
+    state.restore(state.history_index - 1)
+    return state.summary
+
+
+def navigation_forward() -> str:
+    """Implementation of the 'forward' command."""
+    state.restore(state.history_index + 1)
+    return state.summary
+
+
+def navigation_jumps() -> str:
+    """Implementation of the 'jumps' command."""
+    return tabulate(
+        [
+            ("*" if index == state.history_index else "", *jump(position))
+            for index, position in enumerate(state.history)
+        ],
+        tablefmt="plain",
+        showindex=True,
+    )
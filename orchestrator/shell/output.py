@@ -0,0 +1,41 @@
+# Copyright 2026 GÉANT.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections.abc import Iterable
+from typing import Any
+
+from orchestrator.core.utils.json import json_dumps
+from tabulate import tabulate
+
+from orchestrator.shell.settings import settings
+
+OUTPUT_FORMATS = ["table", "json", "jsonl"]
+
+
+def machine_readable() -> bool:
+    """Return True when output is set to one of the JSON formats."""
+    return settings.ORCHESTRATOR_SHELL_OUTPUT != "table"
+
+
+def records_output(records: Iterable[dict[str, Any]]) -> str:
+    """Return records as one JSON array, or as JSON Lines with one record per line."""
+    if settings.ORCHESTRATOR_SHELL_OUTPUT == "jsonl":
+        return "\n".join(json_dumps(record) for record in records)
+    return json_dumps(list(records))
+
+
+def details_output(details: list[tuple[str, Any]]) -> str:
+    """Return details as plain table, or as a single JSON object when the output is machine readable."""
+    if machine_readable():
+        return json_dumps(dict(details))
+    return tabulate(details, tablefmt="plain")
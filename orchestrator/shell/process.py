@@ -12,41 +12,105 @@
 # limitations under the License.
 
 import re
+import time
+from collections.abc import Iterator
+from datetime import datetime, timedelta
+from uuid import UUID
 
-from orchestrator.core.db import ProcessStepTable, ProcessTable, db, transactional
+from orchestrator.core.db import ProcessStepTable, ProcessTable, WorkflowTable, db, transactional
+from orchestrator.core.services.processes import RESUMABLE_STATUSES
 from orchestrator.core.workflow import ProcessStatus, StepStatus
-from sqlalchemy import select
+from sqlalchemy import ColumnElement, Row, Select, func, select
+from sqlalchemy.orm import joinedload
 from structlog import get_logger
 from tabulate import tabulate
 
+from orchestrator.shell.database import (
+    RowLockedError,
+    expire_attribute,
+    read_session,
+    select_for_update,
+    show_updated_value,
+)
+from orchestrator.shell.output import details_output, machine_readable, records_output
 from orchestrator.shell.state import sorted_processes, state
 
 logger = get_logger(__name__)
 
 
+# processes modified up to this long before the last seen modification are polled again by process watch, to also
+# find updates that were committed after a more recent modification was already seen
+WATCH_OVERLAP = timedelta(seconds=10)
+
+# minimum number of seconds between the polls of process watch
+WATCH_MINIMUM_INTERVAL = 0.5
+
+PROCESS_ROW_FIELDS = ["workflow_name", "created_by", "last_status", "last_step", "started_at", "last_modified_at"]
+
+
+def process_row(process: ProcessTable) -> tuple:
+    """Return tuple with the process fields that are shown in a list of processes."""
+    return (
+        process.workflow_name,
+        process.created_by,
+        process.last_status,
+        process.last_step,
+        process.started_at,
+        process.last_modified_at,
+    )
+
+
 def indexed_process_list(processes: list[ProcessTable]) -> str:
-    """Return tabulated, indexed list of processes."""
+    """Return tabulated, indexed list of processes, or list of records when the output is machine readable."""
+    if machine_readable():
+        return records_output(
+            {"index": index, **dict(zip(PROCESS_ROW_FIELDS, process_row(process), strict=True))}
+            for index, process in enumerate(processes)
+        )
     return tabulate(
-        [
-            (
-                process.workflow_name,
-                process.created_by,
-                process.last_status,
-                process.last_step,
-                process.started_at,
-                process.last_modified_at,
-            )
-            for process in processes
-        ],
+        [process_row(process) for process in processes],
         tablefmt="plain",
         disable_numparse=True,
         showindex=True,
     )
 
 
-def query_db() -> list[ProcessTable]:
-    """Return sorted list of processes from the database."""
-    return sorted_processes(ProcessTable.query.all())
+def query_db(*where: ColumnElement[bool]) -> list[ProcessTable]:
+    """Return sorted list of processes from the database, optionally only those that match the where clauses."""
+    return sorted_processes(
+        list(
+            read_session().scalars(
+                select(ProcessTable)
+                .options(joinedload(ProcessTable.workflow))
+                .where(*where)
+                .execution_options(populate_existing=True)
+            )
+        )
+    )
+
+
+def database_now() -> datetime:
+    """Return the current time according to the database clock."""
+    return read_session().execute(select(func.clock_timestamp())).scalar_one()
+
+
+def modified_processes(since: datetime, statuses: list[str]) -> list[ProcessTable]:
+    """Return processes modified at or after since, optionally only those with one of the given statuses.
+
+    Processes that are already loaded in the session are refreshed with the values from the database. Note that
+    orchestrator-core does not index processes.last_modified_at, so without an added index on that column every
+    call scans the processes table.
+    """
+    query = (
+        select(ProcessTable)
+        .options(joinedload(ProcessTable.workflow))
+        .where(ProcessTable.last_modified_at >= since)
+        .order_by(ProcessTable.last_modified_at)
+        .execution_options(populate_existing=True)
+    )
+    if statuses:
+        query = query.where(ProcessTable.last_status.in_(statuses))
+    return list(read_session().scalars(query))
 
 
 def filtered_processes(regular_expression: str, processes: list[ProcessTable]) -> list[ProcessTable]:
@@ -75,9 +139,21 @@ def process_list() -> str:
     return indexed_process_list(state.processes)
 
 
-def process_search(regular_expression: str) -> str:
-    """Add list of filtered processes to the state and return this list tabulated and indexed."""
-    state.processes = query_db()
+def stats_where(stats: Row) -> list[ColumnElement[bool]]:
+    """Return where clauses that select the processes counted in a row of the process statistics."""
+    return [
+        ProcessTable.workflow.has(WorkflowTable.name == stats.workflow),
+        ProcessTable.last_status == stats.status,
+        ProcessTable.last_step.is_not_distinct_from(stats.last_step),
+    ]
+
+
+def process_search(regular_expression: str, stats_index: int | None = None) -> str:
+    """Add list of filtered processes to the state and return this list tabulated and indexed.
+
+    When a stats index is given, only processes counted in that row of the process statistics are searched.
+    """
+    state.processes = query_db(*(stats_where(state.process_stats[stats_index]) if stats_index is not None else []))
     state.filtered_processes = filtered_processes(regular_expression, state.processes)
     return indexed_process_list(state.filtered_processes)
 
@@ -93,14 +169,115 @@ def process_select(index: int) -> str:
 
 def process_details() -> str:
     """Implementation of the 'process details' subcommand."""
-    return tabulate(details(state.selected_process), tablefmt="plain")
+    return details_output(details(state.selected_process))
+
+
+def process_watch(statuses: list[str], interval: float) -> Iterator[str]:
+    """Implementation of the 'process watch' subcommand.
+
+    Poll the database every interval seconds for processes that were modified since the previous poll, and yield
+    the new or changed processes tabulated. The watch starts at the current database time, and every poll overlaps
+    the previous one by WATCH_OVERLAP, where modifications that were already shown are skipped. When the watch is
+    stopped, the watched processes are added to the state.
+    """
+    watched: dict[UUID, ProcessTable] = {}
+    seen: set[tuple[UUID, datetime]] = set()
+    start = since = database_now()
+    try:
+        while True:
+            polled = modified_processes(max(start, since - WATCH_OVERLAP), statuses)
+            if processes := [
+                process for process in polled if (process.process_id, process.last_modified_at) not in seen
+            ]:
+                since = max(since, processes[-1].last_modified_at)
+                seen = {modification for modification in seen if modification[1] >= since - WATCH_OVERLAP}
+                seen |= {(process.process_id, process.last_modified_at) for process in processes}
+                watched |= {process.process_id: process for process in processes}
+                yield tabulate([process_row(process) for process in processes], tablefmt="plain", disable_numparse=True)
+            time.sleep(interval)
+    finally:
+        state.processes = sorted_processes(list(watched.values()))
+        state.filtered_processes = None
+        state.process_index = None
+
+
+def stats_query(since: datetime | None) -> Select:
+    """Return query that counts processes per workflow, last status and last step."""
+    query = (
+        select(
+            WorkflowTable.name.label("workflow"),
+            ProcessTable.last_status.label("status"),
+            ProcessTable.last_step.label("last_step"),
+            func.count().label("processes"),
+        )
+        .join(WorkflowTable, ProcessTable.workflow_id == WorkflowTable.workflow_id)
+        .group_by(WorkflowTable.name, ProcessTable.last_status, ProcessTable.last_step)
+        .order_by(func.count().desc(), WorkflowTable.name)
+    )
+    return query.where(ProcessTable.last_modified_at >= since) if since else query
+
+
+def step_failures_query(since: datetime | None) -> Select:
+    """Return query that counts failed process steps per workflow and step."""
+    query = (
+        select(
+            WorkflowTable.name.label("workflow"),
+            ProcessStepTable.name.label("step"),
+            func.count().label("failures"),
+        )
+        .join(ProcessTable, ProcessStepTable.process_id == ProcessTable.process_id)
+        .join(WorkflowTable, ProcessTable.workflow_id == WorkflowTable.workflow_id)
+        .where(ProcessStepTable.status == StepStatus.FAILED)
+        .group_by(WorkflowTable.name, ProcessStepTable.name)
+        .order_by(func.count().desc(), WorkflowTable.name)
+    )
+    return query.where(ProcessStepTable.completed_at >= since) if since else query
+
+
+def process_stats(since: datetime | None) -> str:
+    """Implementation of the 'process stats' subcommand.
+
+    The process counts are added to the state, so that the processes of a row can be searched by its index.
+    """
+    state.process_stats = list(read_session().execute(stats_query(since)))
+    step_failures = list(read_session().execute(step_failures_query(since)))
+    return "\n\n".join(
+        [
+            tabulate(
+                state.process_stats,
+                headers=["workflow", "status", "last step", "processes"],
+                tablefmt="plain",
+                disable_numparse=True,
+                showindex=True,
+            ),
+            tabulate(step_failures, headers=["workflow", "failed step", "failures"], tablefmt="plain"),
+        ]
+    )
 
 
 def process_leapfrog() -> str:
-    """Implementation of the 'process leapfrog' subcommand."""
+    """Implementation of the 'process leapfrog' subcommand.
+
+    The process is re-read and locked, and its steps are re-read, from the primary database before they are updated,
+    and is left alone when it is not resumable anymore.
+    """
+    selected_process = state.selected_process
     with transactional(db, logger):
+        try:
+            process = select_for_update(
+                select(ProcessTable).where(ProcessTable.process_id == selected_process.process_id)
+            )
+        except RowLockedError:
+            return "ERROR: Process is locked by another process, try again later"
+        if process is None:
+            return "ERROR: Process no longer exists"
+        if process.last_status not in RESUMABLE_STATUSES:
+            expire_attribute(selected_process, "last_status")
+            return (
+                f"ERROR: Process was changed to {process.last_status} since it was displayed, process not leapfrogged"
+            )
         related_steps_db = db.session.scalars(
-            select(ProcessStepTable).where(ProcessStepTable.process_id == state.selected_process.process_id)
+            select(ProcessStepTable).where(ProcessStepTable.process_id == process.process_id)
         )
         related_steps: list[ProcessStepTable] = sorted(related_steps_db, key=lambda step: step.completed_at)
         last_successful_step = next(
@@ -117,6 +294,7 @@ def process_leapfrog() -> str:
         last_step.status = StepStatus.SUCCESS
 
         # Mark the process as failed
-        state.selected_process.last_status = ProcessStatus.FAILED
+        process.last_status = ProcessStatus.FAILED
 
-        return f"Process {state.selected_process.process_id} has been leapfrogged, please retry the process."
+    show_updated_value(selected_process, process, "last_status", ProcessStatus.FAILED)
+    return f"Process {process.process_id} has been leapfrogged, please retry the process."
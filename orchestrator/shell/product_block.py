@@ -12,10 +12,13 @@
 # limitations under the License.
 
 
+from typing import Any
+
 from orchestrator.core.db import SubscriptionInstanceTable
 from tabulate import tabulate
 
-from orchestrator.shell.resource_type import resource_type_table
+from orchestrator.shell.output import details_output, machine_readable, records_output
+from orchestrator.shell.resource_type import resource_type_records, resource_type_table, resource_types_detail
 from orchestrator.shell.state import all_resource_types, state
 
 
@@ -41,6 +44,25 @@ def product_block_table(product_blocks: list[SubscriptionInstanceTable]) -> str:
     )
 
 
+def product_block_records(product_blocks: list[SubscriptionInstanceTable]) -> list[dict[str, Any]]:
+    """Return indexed list of product block records with their resource types."""
+    return [
+        {
+            "index": index,
+            "name": product_block.product_block.name,
+            "resource_types": resource_type_records(all_resource_types(product_block)),
+        }
+        for index, product_block in enumerate(product_blocks)
+    ]
+
+
+def product_blocks_detail(product_blocks: list[SubscriptionInstanceTable]) -> str | list[dict[str, Any]]:
+    """Return product blocks as nested table, or as records when the output is machine readable."""
+    if machine_readable():
+        return product_block_records(product_blocks)
+    return product_block_table(product_blocks) if product_blocks else ""
+
+
 def details_product_block(product_block: SubscriptionInstanceTable) -> list[tuple[str, str]]:
     """Return list of tuples with product block details only."""
     return [
@@ -52,24 +74,24 @@ def details_product_block(product_block: SubscriptionInstanceTable) -> list[tupl
     ]
 
 
-def details_resource_types(product_block: SubscriptionInstanceTable) -> list[tuple[str, str]]:
+def details_resource_types(product_block: SubscriptionInstanceTable) -> list[tuple[str, Any]]:
     """Return list of tuples with resource type details only."""
     return [
-        ("resource types", resource_type_table(all_resource_types(product_block))),
+        ("resource types", resource_types_detail(all_resource_types(product_block))),
     ]
 
 
-def details_depends_on(product_block: SubscriptionInstanceTable) -> list[tuple[str, str]]:
+def details_depends_on(product_block: SubscriptionInstanceTable) -> list[tuple[str, Any]]:
     """Return list of tuples with depends on details only."""
     return [
-        ("depends_on", product_block_table(product_block.depends_on) if product_block.depends_on else ""),
+        ("depends_on", product_blocks_detail(product_block.depends_on)),
     ]
 
 
-def details_in_use_by(product_block: SubscriptionInstanceTable) -> list[tuple[str, str]]:
+def details_in_use_by(product_block: SubscriptionInstanceTable) -> list[tuple[str, Any]]:
     """Return list of tuples with in use by details only."""
     return [
-        ("in_use_by", product_block_table(product_block.in_use_by) if product_block.in_use_by else ""),
+        ("in_use_by", product_blocks_detail(product_block.in_use_by)),
     ]
 
 
@@ -85,6 +107,8 @@ def details_all(product_block: SubscriptionInstanceTable) -> list[tuple[str, str
 
 def product_block_list() -> str:
     """Implementation of the 'product_block list' subcommand."""
+    if machine_readable():
+        return records_output(product_block_records(state.selected_product_blocks))
     return product_block_table(state.selected_product_blocks)
 
 
@@ -92,6 +116,7 @@ def product_block_select(index: int) -> str:
     """Implementation of the 'product_block select' subcommand."""
     state.product_block_index = index
     state.resource_type_index = None
+    state.remember()
     return state.summary
 
 
@@ -100,31 +125,33 @@ def product_block_details(
 ) -> str:
     """Implementation of the 'product_block details' subcommand."""
     if product_block_only:
-        return tabulate(details_product_block(state.selected_product_block), tablefmt="plain")
+        return details_output(details_product_block(state.selected_product_block))
     if resource_types_only:
-        return tabulate(details_resource_types(state.selected_product_block), tablefmt="plain")
+        return details_output(details_resource_types(state.selected_product_block))
     if depends_on_only:
-        return tabulate(details_depends_on(state.selected_product_block), tablefmt="plain")
+        return details_output(details_depends_on(state.selected_product_block))
     if in_use_by_only:
-        return tabulate(details_in_use_by(state.selected_product_block), tablefmt="plain")
-    return tabulate(details_all(state.selected_product_block), tablefmt="plain")
+        return details_output(details_in_use_by(state.selected_product_block))
+    return details_output(details_all(state.selected_product_block))
 
 
 def product_block_depends_on(index: int) -> str:
     """Implementation of the 'product_block depends_on' subcommand."""
     depends_on_product_block = state.selected_product_block.depends_on[index]
-    state.subscription_index = state.subscriptions.index(depends_on_product_block.subscription)
+    state.select_subscription(depends_on_product_block.subscription)
     # note that the selected_product_blocks list below is of the subscription selected just above
     state.product_block_index = state.selected_product_blocks.index(depends_on_product_block)
     state.resource_type_index = None
+    state.remember()
     return state.summary
 
 
 def product_block_in_use_by(index: int) -> str:
     """Implementation of the 'product_block in_use_by' subcommand."""
     in_use_by_product_block = state.selected_product_block.in_use_by[index]
-    state.subscription_index = state.subscriptions.index(in_use_by_product_block.subscription)
+    state.select_subscription(in_use_by_product_block.subscription)
     # note that the selected_product_blocks list below is of the subscription selected just above
     state.product_block_index = state.selected_product_blocks.index(in_use_by_product_block)
     state.resource_type_index = None
+    state.remember()
     return state.summary
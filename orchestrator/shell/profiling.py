@@ -0,0 +1,50 @@
+# Copyright 2026 GÉANT.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import cProfile
+import io
+import pstats
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+
+def profile_report(profiler: cProfile.Profile, snapshot: tracemalloc.Snapshot, limit: int) -> str:
+    """Return the top limit functions by cumulative time and the top limit allocation sites."""
+    functions = io.StringIO()
+    pstats.Stats(profiler, stream=functions).strip_dirs().sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+    allocations = [str(statistic) for statistic in snapshot.statistics("lineno")[:limit]]
+    return "\n".join([functions.getvalue().strip(), "", f"Top {limit} allocation sites:", *allocations])
+
+
+def profile(
+    func: Callable[[], Any], limit: int, pstats_file: Callable[[], Path | None] = lambda: None
+) -> tuple[Any, str]:
+    """Run func under cProfile and tracemalloc, and return its result together with the profile report.
+
+    Optionally the profile is written to the file returned by pstats_file, to be inspected with pstats or other tools.
+    It is called after func ran, so a command that is profiled can still ask for the profile to be written.
+    """
+    profiler = cProfile.Profile()
+    tracemalloc.start()
+    try:
+        result = profiler.runcall(func)
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    if file := pstats_file():
+        profiler.dump_stats(file)
+    report = profile_report(profiler, snapshot, limit)
+    return result, f"{report}\n\nPeak traced memory: {peak / 1024:.1f} KiB"
@@ -11,16 +11,46 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import csv
+from collections import Counter
+from collections.abc import Iterable, Iterator
+from contextlib import nullcontext
+from itertools import islice
+from pathlib import Path
+from typing import Any
+from uuid import UUID
 
 import tabulate
-from orchestrator.core.db import SubscriptionInstanceValueTable, db, transactional
+from orchestrator.core.db import (
+    ProductBlockTable,
+    ResourceTypeTable,
+    SubscriptionInstanceTable,
+    SubscriptionInstanceValueTable,
+    SubscriptionTable,
+    db,
+    transactional,
+)
+from orchestrator.core.utils.json import json_loads
+from sqlalchemy import CTE, BigInteger, cast, func, select
+from sqlalchemy.orm import lazyload
 from structlog import get_logger
 
+from orchestrator.shell.audit import duplicates_query, live_values_query
+from orchestrator.shell.database import (
+    RowLockedError,
+    expire_attribute,
+    read_session,
+    select_for_update,
+    show_updated_value,
+)
+from orchestrator.shell.output import details_output, machine_readable, records_output
 from orchestrator.shell.state import sorted_resource_types, state
 
 logger = get_logger(__name__)
 tabulate.PRESERVE_WHITESPACE = True
 
+APPLY_FIELDS = ["subscription_id", "product_block", "resource_type", "value"]
+
 
 def resource_type_table(resource_types: list[SubscriptionInstanceValueTable], width: int = 0) -> str:
     """Return indexed table of resource types, with name optionally aligned on width."""
@@ -38,6 +68,19 @@ def resource_type_table(resource_types: list[SubscriptionInstanceValueTable], wi
     )
 
 
+def resource_type_records(resource_types: list[SubscriptionInstanceValueTable]) -> list[dict[str, Any]]:
+    """Return indexed list of resource type records, unset or non-scalar resource types have value None."""
+    return [
+        {"index": index, "resource_type": resource_type.resource_type.resource_type, "value": resource_type.value}
+        for index, resource_type in enumerate(sorted_resource_types(resource_types))
+    ]
+
+
+def resource_types_detail(resource_types: list[SubscriptionInstanceValueTable]) -> str | list[dict[str, Any]]:
+    """Return resource types as nested table, or as records when the output is machine readable."""
+    return resource_type_records(resource_types) if machine_readable() else resource_type_table(resource_types)
+
+
 def details(resource_type: SubscriptionInstanceValueTable | None) -> list[tuple[str, str]]:
     """Return list of tuples with resource type detail information."""
     if resource_type is None:
@@ -53,30 +96,342 @@ def details(resource_type: SubscriptionInstanceValueTable | None) -> list[tuple[
 
 def resource_type_list() -> str:
     """Implementation of the 'resource_type list' subcommand."""
+    state.capture_displayed()
+    if machine_readable():
+        return records_output(resource_type_records(state.selected_resource_types))
     return resource_type_table(state.selected_resource_types)
 
 
 def resource_type_select(index: int) -> str:
     """Implementation of the 'resource_type select' subcommand."""
     state.resource_type_index = index
+    state.remember()
     return state.summary
 
 
 def resource_type_details() -> str:
     """Implementation of the 'resource_type details' subcommand."""
-    return tabulate.tabulate(details(state.selected_resource_type), tablefmt="plain")
+    state.capture_displayed()
+    return details_output(details(state.selected_resource_type))
 
 
-def resource_type_update(new_value: str) -> None:
-    """Implementation of the 'resource_type update' subcommand."""
+def add_resource_type_value(resource_type: SubscriptionInstanceValueTable, new_value: str) -> str | None:
+    """Add value of previously unset resource type to the locked product block, unless it was set in the meantime."""
+    product_block = state.selected_product_block
+    locked_product_block = select_for_update(
+        select(SubscriptionInstanceTable).where(
+            SubscriptionInstanceTable.subscription_instance_id == product_block.subscription_instance_id
+        )
+    )
+    if locked_product_block is None:
+        return "product block no longer exists"
+    if (
+        current_value := db.session.scalar(
+            select(SubscriptionInstanceValueTable.value).where(
+                SubscriptionInstanceValueTable.subscription_instance_id == product_block.subscription_instance_id,
+                SubscriptionInstanceValueTable.resource_type_id == resource_type.resource_type_id,
+            )
+        )
+    ) is not None:
+        expire_attribute(product_block, "values")
+        return f"resource type was set to {current_value} since it was displayed, resource type not updated"
+    locked_product_block.values.append(
+        SubscriptionInstanceValueTable(resource_type_id=resource_type.resource_type.resource_type_id, value=new_value)
+    )
+    if locked_product_block is not product_block:
+        # the product block was read from the read-only database, reload its values when they are shown again
+        expire_attribute(product_block, "values")
+    return None
+
+
+def update_resource_type_value(
+    resource_type: SubscriptionInstanceValueTable, displayed_value: str, new_value: str
+) -> str | None:
+    """Update value of the locked resource type, unless it was changed since it was displayed."""
+    current = select_for_update(
+        select(SubscriptionInstanceValueTable).where(
+            SubscriptionInstanceValueTable.subscription_instance_value_id
+            == resource_type.subscription_instance_value_id
+        )
+    )
+    if current is None:
+        return "resource type value no longer exists"
+    if current.value != displayed_value:
+        expire_attribute(resource_type, "value")
+        return f"resource type was changed to {current.value} since it was displayed, resource type not updated"
+    current.value = new_value
+    show_updated_value(resource_type, current, "value", new_value)
+    return None
+
+
+def resource_type_update(new_value: str) -> str | None:
+    """Implementation of the 'resource_type update' subcommand.
+
+    The resource type value is re-read and locked just before it is updated, and is left alone when it was changed
+    in the database since it was displayed. Return a warning when the resource type was not updated.
+    """
+    resource_type = state.selected_resource_type
+    displayed_value = state.displayed_resource_type_value
     with transactional(db, logger):
-        if state.selected_resource_type.value is None:
+        try:
+            if displayed_value is None:
+                # add previously unset resource type to list of product block values
+                warning = add_resource_type_value(resource_type, new_value)
+            else:
+                # otherwise just update the existing resource type value
+                warning = update_resource_type_value(resource_type, displayed_value, new_value)
+        except RowLockedError:
+            return "resource type is locked by another process, try again later"
+    if warning is None:
+        state.displayed_resource_type_value = new_value
+    return warning
+
+
+def json_change(line: str) -> dict[str, str] | str:
+    """Return change read from a JSON line with its values as strings, or why the line is not a valid change."""
+    try:
+        record = json_loads(line)
+    except ValueError as value_error:
+        return f"invalid JSON: {value_error}"
+    if not isinstance(record, dict):
+        return "invalid JSON: expected an object"
+    return {str(field): str(value) for field, value in record.items() if value is not None}
+
+
+def read_changes(file: Path) -> Iterator[dict[str, str] | str]:
+    """Read resource type value changes from a JSON Lines file, or from a CSV file with a header row.
+
+    A line that cannot be read as a change is returned as the reason why. Files are read as UTF-8, with an optional
+    byte order mark as written by spreadsheet applications.
+    """
+    with file.open(newline="", encoding="utf-8-sig") as changes_file:
+        if file.suffix in [".jsonl", ".json"]:
+            yield from (json_change(line) for line in changes_file if line.strip())
+        else:
+            yield from csv.DictReader(changes_file)
+
+
+def chunked(changes: Iterable[dict[str, str] | str], chunk_size: int) -> Iterator[list[dict[str, str] | str]]:
+    """Return lists of at most chunk_size changes."""
+    iterator = iter(changes)
+    while chunk := list(islice(iterator, chunk_size)):
+        yield chunk
+
+
+def subscription_id(change: dict[str, str]) -> UUID | None:
+    """Return subscription ID of change, or None when it is not a valid UUID."""
+    try:
+        return UUID(str(change.get("subscription_id")))
+    except ValueError:
+        return None
+
+
+def resolve_product_blocks(changes: list[dict[str, str]]) -> dict[tuple[UUID, str], list[SubscriptionInstanceTable]]:
+    """Return product blocks of all changes, looked up in one query, by subscription ID and product block name."""
+    product_blocks: dict[tuple[UUID, str], list[SubscriptionInstanceTable]] = {}
+    for product_block in db.session.scalars(
+        select(SubscriptionInstanceTable)
+        .join(ProductBlockTable)
+        .where(
+            SubscriptionInstanceTable.subscription_id.in_({subscription_id(change) for change in changes} - {None}),
+            ProductBlockTable.name.in_({change.get("product_block") for change in changes}),
+        )
+        .options(
+            lazyload(SubscriptionInstanceTable.in_use_by_block_relations),
+            lazyload(SubscriptionInstanceTable.depends_on_block_relations),
+        )
+    ):
+        key = (product_block.subscription_id, product_block.product_block.name)
+        product_blocks.setdefault(key, []).append(product_block)
+    return product_blocks
+
+
+def resolve_resource_types(changes: list[dict[str, str]]) -> dict[str, ResourceTypeTable]:
+    """Return resource types of all changes, looked up in one query, by resource type name."""
+    return {
+        resource_type.resource_type: resource_type
+        for resource_type in db.session.scalars(
+            select(ResourceTypeTable).where(
+                ResourceTypeTable.resource_type.in_({change.get("resource_type") for change in changes})
+            )
+        )
+    }
+
+
+def apply_change(
+    change: dict[str, str],
+    product_blocks: list[SubscriptionInstanceTable],
+    resource_type: ResourceTypeTable | None,
+    dry_run: bool,
+) -> str:
+    """Apply change to its product block and return 'applied' or 'unchanged', or why the change is unresolved."""
+    if len(product_blocks) != 1:
+        return "product block not found" if not product_blocks else "multiple product blocks with this name"
+    product_block = product_blocks[0]
+    if resource_type is None or resource_type not in product_block.product_block.resource_types:
+        return "resource type not found on product block"
+    values = [value for value in product_block.values if value.resource_type_id == resource_type.resource_type_id]
+    if len(values) > 1:
+        return "non-scalar resource type"
+    if values and values[0].value == change["value"]:
+        return "unchanged"
+    if not dry_run:
+        if values:
+            values[0].value = change["value"]
+        else:
             # add previously unset resource type to list of product block values
-            state.selected_product_block.values.append(
-                SubscriptionInstanceValueTable(
-                    resource_type_id=state.selected_resource_type.resource_type.resource_type_id, value=new_value
-                )
+            product_block.values.append(
+                SubscriptionInstanceValueTable(resource_type_id=resource_type.resource_type_id, value=change["value"])
             )
+    return "applied"
+
+
+def apply_chunk(changes: list[dict[str, str] | str], dry_run: bool) -> list[str]:
+    """Apply chunk of changes and return the outcome of every change, lines that could not be read are unresolved."""
+    records = [change for change in changes if isinstance(change, dict)]
+    product_blocks = resolve_product_blocks(records)
+    resource_types = resolve_resource_types(records)
+    outcomes = []
+    for change in changes:
+        if isinstance(change, str):
+            outcomes.append(change)
+        elif any(change.get(field) is None for field in APPLY_FIELDS):
+            outcomes.append(f"missing field(s), expected {', '.join(APPLY_FIELDS)}")
+        elif (change_subscription_id := subscription_id(change)) is None:
+            outcomes.append("invalid subscription_id")
         else:
-            # otherwise just update the existing resource type value
-            state.selected_resource_type.value = new_value
+            outcomes.append(
+                apply_change(
+                    change,
+                    product_blocks.get((change_subscription_id, change["product_block"]), []),
+                    resource_types.get(change["resource_type"]),
+                    dry_run,
+                )
+            )
+    return outcomes
+
+
+def resource_type_apply(file: Path, chunk_size: int, dry_run: bool) -> str:
+    """Implementation of the 'resource_type apply' subcommand.
+
+    The changes are applied and committed per chunk, and a summary of applied, unchanged and unresolved changes is
+    returned, together with a list of the unresolved changes. When the file cannot be read to the end, the summary of
+    the changes that were already committed is returned with the error.
+    """
+    outcomes: Counter[str] = Counter()
+    unresolved: list[list[object]] = []
+    row = 0
+    try:
+        for changes in chunked(read_changes(file), chunk_size):
+            with nullcontext() if dry_run else transactional(db, logger):
+                chunk_outcomes = apply_chunk(changes, dry_run)
+            for change, outcome in zip(changes, chunk_outcomes, strict=True):
+                row += 1
+                if outcome in ["applied", "unchanged"]:
+                    outcomes[outcome] += 1
+                else:
+                    outcomes["unresolved"] += 1
+                    fields = [change.get(field) for field in APPLY_FIELDS[:3]] if isinstance(change, dict) else []
+                    unresolved.append([row, *fields, outcome])
+    except (OSError, ValueError) as error:
+        if not row:
+            return f"ERROR: {error}"
+        done = "checked" if dry_run else "committed"
+        summary = apply_summary(outcomes, unresolved, dry_run)
+        return f"{summary}\nERROR: {error}, only the {row} change(s) above were {done}"
+    return apply_summary(outcomes, unresolved, dry_run)
+
+
+def apply_summary(outcomes: Counter[str], unresolved: list[list[object]], dry_run: bool) -> str:
+    """Return summary of applied, unchanged and unresolved changes, followed by a list of the unresolved changes."""
+    summary = tabulate.tabulate(
+        [
+            ("would be applied" if dry_run else "applied", outcomes["applied"]),
+            ("unchanged", outcomes["unchanged"]),
+            ("unresolved", outcomes["unresolved"]),
+        ],
+        tablefmt="plain",
+    )
+    return f"{summary}\n{tabulate.tabulate(unresolved, tablefmt='plain')}" if unresolved else summary
+
+
+def top_values(live_values: CTE, limit: int) -> str:
+    """Return the most frequent values with the number of times and the number of subscriptions they are used by."""
+    uses = func.count().label("uses")
+    query = (
+        select(live_values.c.value, uses, func.count(live_values.c.subscription_id.distinct()).label("subscriptions"))
+        .group_by(live_values.c.value)
+        .order_by(uses.desc(), live_values.c.value)
+        .limit(limit)
+    )
+    rows = read_session().execute(query).all()
+    return tabulate.tabulate(rows, headers=["value", "uses", "subscriptions"], tablefmt="plain", disable_numparse=True)
+
+
+def duplicate_values(live_values: CTE, limit: int) -> str:
+    """Return indexed list of values used by more than one subscription, and add these subscriptions to the state."""
+    duplicates = duplicates_query(live_values)
+    query = (
+        select(live_values.c.value, SubscriptionTable)
+        .distinct()
+        .join(SubscriptionTable, live_values.c.subscription_id == SubscriptionTable.subscription_id)
+        .join(duplicates, live_values.c.value == duplicates.c.value)
+        .order_by(live_values.c.value, SubscriptionTable.description)
+        .limit(limit)
+    )
+    rows = read_session().execute(query.execution_options(populate_existing=True)).all()
+    state.list_subscriptions([subscription for _, subscription in rows])
+    return tabulate.tabulate(
+        [(value, subscription.description, subscription.subscription_id) for value, subscription in rows],
+        tablefmt="plain",
+        disable_numparse=True,
+        showindex=True,
+    )
+
+
+def numeric_gaps(live_values: CTE, limit: int) -> str:
+    """Return the free ranges between the numeric values that are in use, found with a window over the sorted values."""
+    numbers = (
+        select(cast(live_values.c.value, BigInteger).label("number"))
+        .where(live_values.c.value.regexp_match("^[0-9]{1,18}$"))
+        .distinct()
+        .subquery("numbers")
+    )
+    neighbours = select(
+        numbers.c.number, func.lead(numbers.c.number).over(order_by=numbers.c.number).label("next_number")
+    ).subquery("neighbours")
+    query = (
+        select(
+            (neighbours.c.number + 1).label("first_free"),
+            (neighbours.c.next_number - 1).label("last_free"),
+            (neighbours.c.next_number - neighbours.c.number - 1).label("free"),
+        )
+        .where(neighbours.c.next_number - neighbours.c.number > 1)
+        .order_by(neighbours.c.number)
+        .limit(limit)
+    )
+    rows = read_session().execute(query).all()
+    used = read_session().execute(select(func.count(), func.min(numbers.c.number), func.max(numbers.c.number))).one()
+    summary = f"{used[0]} numeric value(s) in use" + (f", from {used[1]} to {used[2]}" if used[0] else "")
+    return "\n".join([summary, tabulate.tabulate(rows, headers=["first free", "last free", "free"], tablefmt="plain")])
+
+
+def resource_type_usage(resource_type: str, duplicates: bool, gaps: bool, limit: int) -> str:
+    """Implementation of the 'resource_type usage' subcommand.
+
+    Only values of subscriptions that are not terminated are counted. By default the most frequent values are listed,
+    optionally the values used by more than one subscription, or the free ranges between numeric values.
+    """
+    resource_type_id = read_session().scalar(
+        select(ResourceTypeTable.resource_type_id).where(ResourceTypeTable.resource_type == resource_type)
+    )
+    if resource_type_id is None:
+        return f"ERROR: unknown resource type {resource_type}"
+    live_values = live_values_query(SubscriptionInstanceValueTable.resource_type_id == resource_type_id).cte(
+        "live_values"
+    )
+    if duplicates:
+        return duplicate_values(live_values, limit)
+    if gaps:
+        return numeric_gaps(live_values, limit)
+    return top_values(live_values, limit)
@@ -12,7 +12,9 @@
 # limitations under the License.
 
 from pathlib import Path
+from typing import Literal
 
+from pydantic import NonNegativeInt
 from pydantic_settings import BaseSettings
 
 
@@ -21,6 +23,12 @@ class Settings(BaseSettings):
 
     ORCHESTRATOR_SHELL_HISTFILE: Path = Path("~/.orchestrator_shell_history").expanduser()
     ORCHESTRATOR_SHELL_HISTFILE_SIZE: int = 1000
+    ORCHESTRATOR_SHELL_UNIQUE_RESOURCE_TYPES: list[str] = []
+    ORCHESTRATOR_SHELL_STATEMENT_TIMEOUT: NonNegativeInt = 0
+    ORCHESTRATOR_SHELL_OUTPUT: Literal["table", "json", "jsonl"] = "table"
+    ORCHESTRATOR_SHELL_DATABASES: dict[str, str] = {}
+    ORCHESTRATOR_SHELL_READ_ONLY_DATABASE_URI: str | None = None
+    ORCHESTRATOR_SHELL_PIN_PRIMARY: bool = False
 
 
 settings = Settings()
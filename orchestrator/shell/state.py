@@ -20,8 +20,22 @@ from orchestrator.core.db import (
     SubscriptionInstanceValueTable,
     SubscriptionTable,
 )
+from sqlalchemy import Row
 from tabulate import tabulate
 
+HISTORY_SIZE = 100
+
+
+@dataclass
+class Position:
+    """Selected subscription, product block and resource type, together with the list they were selected from."""
+
+    subscriptions: list[SubscriptionTable]
+    filtered_subscriptions: list[SubscriptionTable] | None
+    subscription_index: int | None
+    product_block_index: int | None
+    resource_type_index: int | None
+
 
 @dataclass
 class State:
@@ -33,8 +47,84 @@ class State:
     processes: list[ProcessTable] = field(default_factory=list)
     filtered_processes: list[ProcessTable] | None = None
     process_index: int | None = None
+    process_stats: list[Row] = field(default_factory=list)
     product_block_index: int | None = None
     resource_type_index: int | None = None
+    subscription_stats: dict[tuple[str, str | None], list[Row]] = field(default_factory=dict)
+    history: list[Position] = field(default_factory=list)
+    history_index: int = -1
+    displayed_subscription: dict[str, object] = field(default_factory=dict)
+    displayed_resource_type_value: str | None = None
+
+    @property
+    def position(self) -> Position:
+        """Return the current position.
+
+        The lists of subscriptions are referenced, not copied, they are replaced and never changed in place.
+        """
+        return Position(
+            subscriptions=self.subscriptions,
+            filtered_subscriptions=self.filtered_subscriptions,
+            subscription_index=self.subscription_index,
+            product_block_index=self.product_block_index,
+            resource_type_index=self.resource_type_index,
+        )
+
+    def remember(self) -> None:
+        """Add the current position to the navigation history, dropping any positions that could be gone forward to.
+
+        The loaded subscriptions are kept with the position, so going back does not need to query the database again.
+        """
+        self.capture_displayed()
+        self.history = [*self.history[: self.history_index + 1][-(HISTORY_SIZE - 1) :], self.position]
+        self.history_index = len(self.history) - 1
+
+    def restore(self, history_index: int) -> None:
+        """Go to a position in the navigation history."""
+        position = self.history[history_index]
+        self.subscriptions = position.subscriptions
+        self.filtered_subscriptions = position.filtered_subscriptions
+        self.subscription_index = position.subscription_index
+        self.product_block_index = position.product_block_index
+        self.resource_type_index = position.resource_type_index
+        self.history_index = history_index
+        self.capture_displayed()
+
+    def capture_displayed(self) -> None:
+        """Capture the values of the selected subscription and resource type as they are displayed.
+
+        Updates compare these values with the database to detect changes made since they were displayed. The loaded
+        objects cannot be used for this, as they are reloaded from the database after every commit.
+        """
+        self.displayed_subscription = (
+            {
+                attribute.key: getattr(self.selected_subscription, attribute.key)
+                for attribute in SubscriptionTable.__mapper__.column_attrs  # type: ignore[attr-defined]
+            }
+            if self.subscription_index is not None
+            else {}
+        )
+        self.displayed_resource_type_value = (
+            self.selected_resource_type.value if self.resource_type_index is not None else None
+        )
+
+    def reset(self) -> None:
+        """Forget all lists, selections and the navigation history, for example after connecting to another database."""
+        vars(self).update(vars(State()))
+
+    def list_subscriptions(self, subscriptions: list[SubscriptionTable]) -> None:
+        """Replace the list of subscriptions, and clear the filter and all selections made in the previous list."""
+        self.subscriptions = subscriptions
+        self.filtered_subscriptions = None
+        self.subscription_index = None
+        self.product_block_index = None
+        self.resource_type_index = None
+
+    def select_subscription(self, subscription: SubscriptionTable) -> None:
+        """Select subscription, and add it to a new list of subscriptions when it is not listed yet."""
+        if subscription not in self.subscriptions:
+            self.subscriptions = [*self.subscriptions, subscription]
+        self.subscription_index = self.subscriptions.index(subscription)
 
     @property
     def selected_subscription(self) -> SubscriptionTable:
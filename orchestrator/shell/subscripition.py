@@ -11,21 +11,76 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import re
+import csv
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
+from itertools import groupby
+from pathlib import Path
+from typing import Any
 
-from orchestrator.core.db import SubscriptionTable, db, transactional
+from orchestrator.core.db import (
+    ProductBlockTable,
+    ProductTable,
+    ResourceTypeTable,
+    SubscriptionInstanceTable,
+    SubscriptionInstanceValueTable,
+    SubscriptionTable,
+    db,
+    transactional,
+)
+from orchestrator.core.utils.json import json_dumps
+from sqlalchemy import ColumnElement, Engine, Row, Select, func, or_, select
+from sqlalchemy.exc import DataError, SQLAlchemyError
+from sqlalchemy.orm import Session
 from structlog import get_logger
 from tabulate import tabulate
 
-from orchestrator.shell.product_block import product_block_table
+from orchestrator.shell.database import (
+    RowLockedError,
+    database_uris,
+    expire_attribute,
+    read_engine,
+    read_session,
+    select_for_update,
+    show_updated_value,
+)
+from orchestrator.shell.output import details_output, machine_readable, records_output
+from orchestrator.shell.product_block import product_blocks_detail
 from orchestrator.shell.state import sorted_subscriptions, state
 
 logger = get_logger(__name__)
 
+EXPORT_BATCH_SIZE = 1000
+EXPORT_SUBSCRIPTION_FIELDS = [
+    "subscription_id",
+    "description",
+    "status",
+    "product",
+    "customer_id",
+    "insync",
+    "start_date",
+    "end_date",
+    "note",
+]
+EXPORT_VALUE_FIELDS = ["product_block", "subscription_instance_id", "label", "resource_type", "value"]
+STATS_GROUP_BY = {
+    "product": ProductTable.name,
+    "status": SubscriptionTable.status,
+    "insync": SubscriptionTable.insync,
+    "customer": SubscriptionTable.customer_id,
+}
+STATS_BUCKETS = ["year", "quarter", "month", "week", "day"]
+
 
 def indexed_subscription_list(subscriptions: list[SubscriptionTable]) -> str:
-    """Return tabulated indexed list of subscriptions."""
+    """Return tabulated indexed list of subscriptions, or list of records when the output is machine readable."""
+    if machine_readable():
+        return records_output(
+            {"index": index, "description": subscription.description, "subscription_id": subscription.subscription_id}
+            for index, subscription in enumerate(subscriptions)
+        )
     return tabulate(
         [(subscription.description, subscription.subscription_id) for subscription in subscriptions],
         tablefmt="plain",
@@ -34,15 +89,47 @@ def indexed_subscription_list(subscriptions: list[SubscriptionTable]) -> str:
     )
 
 
-def query_db() -> list[SubscriptionTable]:
-    """Return sorted and list of subscriptions from the database."""
-    return sorted_subscriptions(SubscriptionTable.query.all())
+@dataclass
+class SubscriptionFilter:
+    """Filter on subscriptions that is applied by the database."""
+
+    regular_expression: str | None = None
+    status: str | None = None
+    product: str | None = None
+    customer_id: str | None = None
+    insync: bool | None = None
+    start_after: datetime | None = None
+    end_before: datetime | None = None
 
+    @property
+    def where(self) -> list[ColumnElement[bool]]:  # noqa: C901
+        """Return where clauses for all set filter fields."""
+        where = []
+        if self.regular_expression:
+            where.append(SubscriptionTable.description.regexp_match(self.regular_expression, flags="i"))
+        if self.status:
+            where.append(SubscriptionTable.status == self.status)
+        if self.product:
+            where.append(
+                SubscriptionTable.product.has(or_(ProductTable.name == self.product, ProductTable.tag == self.product))
+            )
+        if self.customer_id:
+            where.append(SubscriptionTable.customer_id == self.customer_id)
+        if self.insync is not None:
+            where.append(SubscriptionTable.insync.is_(self.insync))
+        if self.start_after:
+            where.append(SubscriptionTable.start_date > self.start_after)
+        if self.end_before:
+            where.append(SubscriptionTable.end_date < self.end_before)
+        return where
 
-def filtered_subscriptions(regular_expression: str, subscriptions: list[SubscriptionTable]) -> list[SubscriptionTable]:
-    """Return filtered list of subscriptions."""
-    pattern = re.compile(regular_expression, flags=re.IGNORECASE)
-    return list(filter(lambda subscription: pattern.search(subscription.description), subscriptions))
+
+def query_db(subscription_filter: SubscriptionFilter, limit: int | None = None) -> list[SubscriptionTable]:
+    """Return sorted list of filtered subscriptions from the database, optionally only the limit most recent ones."""
+    query = select(SubscriptionTable).where(*subscription_filter.where)
+    if limit:
+        query = query.order_by(SubscriptionTable.start_date.desc().nulls_last()).limit(limit)
+    return sorted_subscriptions(list(read_session().scalars(query.execution_options(populate_existing=True))))
 
 
 def details_subscription_only(subscription: SubscriptionTable) -> list[tuple[str, str]]:
@@ -60,10 +147,10 @@ def details_subscription_only(subscription: SubscriptionTable) -> list[tuple[str
     ]
 
 
-def details_product_blocks_only() -> list[tuple[str, str]]:
+def details_product_blocks_only() -> list[tuple[str, Any]]:
     """Return list of tuples with product blocks details only."""
     return [
-        ("product block(s)", product_block_table(state.selected_product_blocks)),
+        ("product block(s)", product_blocks_detail(state.selected_product_blocks)),
     ]
 
 
@@ -72,18 +159,60 @@ def details_all(subscription: SubscriptionTable) -> list[tuple[str, str]]:
     return details_subscription_only(subscription) + details_product_blocks_only()
 
 
-def subscription_list() -> str:
+def subscription_list(subscription_filter: SubscriptionFilter) -> str:
     """Add list of the ten most recent subscriptions to the state and return this list tabulated and indexed."""
-    state.subscriptions = query_db()[-10:]
-    state.filtered_subscriptions = None
-    return indexed_subscription_list(state.subscriptions)
+    return subscription_search(subscription_filter, limit=10)
 
 
-def subscription_search(regular_expression: str) -> str:
+def subscription_search(subscription_filter: SubscriptionFilter, limit: int | None = None) -> str:
     """Add list of filtered subscriptions to the state and return this list tabulated and indexed."""
-    state.subscriptions = query_db()
-    state.filtered_subscriptions = filtered_subscriptions(regular_expression, state.subscriptions)
-    return indexed_subscription_list(state.filtered_subscriptions)
+    try:
+        # a savepoint keeps an explicit transaction usable when the database rejects the regular expression
+        with read_session().begin_nested():
+            subscriptions = query_db(subscription_filter, limit)
+    except DataError as data_error:
+        return f"ERROR: {data_error.orig}"
+    state.list_subscriptions(subscriptions)
+    return indexed_subscription_list(state.subscriptions)
+
+
+def search_database(
+    name: str, engine: Engine, subscription_filter: SubscriptionFilter
+) -> tuple[list[tuple], str | None]:
+    """Return database name, description and ID of the filtered subscriptions in one database, or an error."""
+    try:
+        with Session(engine) as session:
+            return [
+                (name, description, subscription_id)
+                for description, subscription_id in session.execute(
+                    select(SubscriptionTable.description, SubscriptionTable.subscription_id).where(
+                        *subscription_filter.where
+                    )
+                )
+            ], None
+    except SQLAlchemyError as error:
+        return [], f"ERROR: {name}: {getattr(error, 'orig', None) or error}"
+
+
+def subscription_search_all(subscription_filter: SubscriptionFilter) -> str:
+    """Search all configured databases concurrently, and return the merged list of subscriptions with their database.
+
+    The subscriptions are only listed, use the 'connect' command to select a subscription in another database.
+    """
+    # engines are created up front, the threads only use them
+    engines = {name: read_engine(name) for name in database_uris()}
+    with ThreadPoolExecutor(max_workers=len(engines)) as executor:
+        results = list(executor.map(search_database, engines, engines.values(), [subscription_filter] * len(engines)))
+    rows = sorted((row for database_rows, _ in results for row in database_rows), key=lambda row: (row[1], row[0]))
+    errors = [error for _, error in results if error]
+    if machine_readable():
+        listing = records_output(
+            {"database": database, "description": description, "subscription_id": subscription_id}
+            for database, description, subscription_id in rows
+        )
+    else:
+        listing = tabulate(rows, tablefmt="plain", disable_numparse=True)
+    return "\n".join([*errors, listing])
 
 
 def subscription_select(index: int) -> str:
@@ -94,19 +223,180 @@ def subscription_select(index: int) -> str:
         state.subscription_index = state.subscriptions.index(state.filtered_subscriptions[index])
     state.product_block_index = None
     state.resource_type_index = None
+    state.remember()
     return state.summary
 
 
 def subscription_details(subscription_only: bool, product_blocks_only: bool) -> str:
     """Implementation of the 'subscription details' subcommand."""
+    state.capture_displayed()
     if subscription_only:
-        return tabulate(details_subscription_only(state.selected_subscription), tablefmt="plain")
+        return details_output(details_subscription_only(state.selected_subscription))
     if product_blocks_only:
-        return tabulate(details_product_blocks_only(), tablefmt="plain")
-    return tabulate(details_all(state.selected_subscription), tablefmt="plain")
+        return details_output(details_product_blocks_only())
+    return details_output(details_all(state.selected_subscription))
+
+
+def stats_query(group_by: str, bucket: str | None) -> Select:
+    """Return query that counts subscriptions, and subscriptions not in sync, grouped and optionally bucketed."""
+    groups = [STATS_GROUP_BY[group_by].label(group_by)]
+    if bucket:
+        groups.append(func.date_trunc(bucket, SubscriptionTable.start_date).label("start_date"))
+    return (
+        select(
+            *groups,
+            func.count().label("subscriptions"),
+            func.count().filter(SubscriptionTable.insync.is_(False)).label("not in sync"),
+        )
+        .join(ProductTable, SubscriptionTable.product_id == ProductTable.product_id)
+        .group_by(*groups)
+        .order_by(*groups)
+    )
+
+
+def subscription_stats(group_by: str, bucket: str | None, refresh: bool) -> str:
+    """Implementation of the 'subscription stats' subcommand.
 
+    Statistics are cached in the state for the rest of the session, unless a refresh is requested.
+    """
+    if refresh or (group_by, bucket) not in state.subscription_stats:
+        state.subscription_stats[group_by, bucket] = list(read_session().execute(stats_query(group_by, bucket)))
+    rows = state.subscription_stats[group_by, bucket]
+    return tabulate(rows, headers=list(rows[0]._fields) if rows else (), tablefmt="plain", disable_numparse=True)
 
-def subscription_update(field: str, new_value: str | bool | datetime | None) -> None:
-    """Implementation of the 'subscription update' subcommand."""
+
+def subscription_update(field: str, new_value: str | bool | datetime | None) -> str | None:
+    """Implementation of the 'subscription update' subcommand.
+
+    The subscription is re-read and locked just before it is updated, and is left alone when the field was changed
+    in the database since it was displayed. Return a warning when the subscription was not updated.
+    """
+    subscription = state.selected_subscription
+    displayed_value = state.displayed_subscription[field]
     with transactional(db, logger):
-        setattr(state.selected_subscription, field, new_value)
+        try:
+            current = select_for_update(
+                select(SubscriptionTable).where(SubscriptionTable.subscription_id == subscription.subscription_id)
+            )
+        except RowLockedError:
+            return "subscription is locked by another process, try again later"
+        if current is None:
+            return "subscription no longer exists"
+        if (current_value := getattr(current, field)) != displayed_value:
+            expire_attribute(subscription, field)
+            return f"{field} was changed to {current_value} since it was displayed, subscription not updated"
+        setattr(current, field, new_value)
+    show_updated_value(subscription, current, field, new_value)
+    state.displayed_subscription[field] = new_value
+    return None
+
+
+def export_query(subscription_filter: SubscriptionFilter) -> Select:
+    """Return query for all subscription, product block and resource type values, ordered by subscription."""
+    return (
+        select(
+            SubscriptionTable.subscription_id,
+            SubscriptionTable.description,
+            SubscriptionTable.status,
+            ProductTable.name.label("product"),
+            SubscriptionTable.customer_id,
+            SubscriptionTable.insync,
+            SubscriptionTable.start_date,
+            SubscriptionTable.end_date,
+            SubscriptionTable.note,
+            ProductBlockTable.name.label("product_block"),
+            SubscriptionInstanceTable.subscription_instance_id,
+            SubscriptionInstanceTable.label,
+            ResourceTypeTable.resource_type,
+            SubscriptionInstanceValueTable.value,
+        )
+        .join(ProductTable, SubscriptionTable.product_id == ProductTable.product_id)
+        .outerjoin(
+            SubscriptionInstanceTable, SubscriptionTable.subscription_id == SubscriptionInstanceTable.subscription_id
+        )
+        .outerjoin(ProductBlockTable, SubscriptionInstanceTable.product_block_id == ProductBlockTable.product_block_id)
+        .outerjoin(
+            SubscriptionInstanceValueTable,
+            SubscriptionInstanceTable.subscription_instance_id
+            == SubscriptionInstanceValueTable.subscription_instance_id,
+        )
+        .outerjoin(
+            ResourceTypeTable, SubscriptionInstanceValueTable.resource_type_id == ResourceTypeTable.resource_type_id
+        )
+        .where(*subscription_filter.where)
+        .order_by(SubscriptionTable.subscription_id, SubscriptionInstanceTable.subscription_instance_id)
+    )
+
+
+def export_rows(subscription_filter: SubscriptionFilter) -> Iterator[Row]:
+    """Stream the rows of the export query from a server side cursor in batches of EXPORT_BATCH_SIZE rows."""
+    yield from read_session().execute(export_query(subscription_filter).execution_options(yield_per=EXPORT_BATCH_SIZE))
+
+
+def export_record(rows: Iterable[Row]) -> dict[str, Any]:
+    """Return nested record of a subscription with its product blocks and resource type values."""
+    rows = list(rows)
+    record = {field: getattr(rows[0], field) for field in EXPORT_SUBSCRIPTION_FIELDS}
+    record["product_blocks"] = []
+    for _, instance_rows in groupby(rows, key=lambda row: row.subscription_instance_id):
+        instance_rows = list(instance_rows)
+        if instance_rows[0].subscription_instance_id is None:
+            continue
+        resource_types: dict[str, Any] = {}
+        for row in instance_rows:
+            if row.resource_type is None:
+                continue
+            if row.resource_type not in resource_types:
+                resource_types[row.resource_type] = row.value
+            elif isinstance(resource_types[row.resource_type], list):
+                resource_types[row.resource_type].append(row.value)
+            else:
+                resource_types[row.resource_type] = [resource_types[row.resource_type], row.value]
+        record["product_blocks"].append(
+            {
+                "name": instance_rows[0].product_block,
+                "subscription_instance_id": instance_rows[0].subscription_instance_id,
+                "label": instance_rows[0].label,
+                "resource_types": resource_types,
+            }
+        )
+    return record
+
+
+def export_jsonl(rows: Iterable[Row], file: Path) -> int:
+    """Write one JSON record per subscription to file and return the number of subscriptions written."""
+    count = 0
+    with file.open("w") as output:
+        for _, subscription_rows in groupby(rows, key=lambda row: row.subscription_id):
+            output.write(json_dumps(export_record(subscription_rows)) + "\n")
+            count += 1
+    return count
+
+
+def export_csv(rows: Iterable[Row], file: Path) -> int:
+    """Write one CSV row per resource type value to file and return the number of subscriptions written."""
+    count = 0
+    with file.open("w", newline="") as output:
+        writer = csv.writer(output)
+        writer.writerow(EXPORT_SUBSCRIPTION_FIELDS + EXPORT_VALUE_FIELDS)
+        for _, subscription_rows in groupby(rows, key=lambda row: row.subscription_id):
+            writer.writerows(subscription_rows)
+            count += 1
+    return count
+
+
+def subscription_export(file: Path, output_format: str, subscription_filter: SubscriptionFilter) -> int:
+    """Implementation of the 'subscription export' subcommand.
+
+    The export is written to a temporary file next to file, that only replaces file when the export succeeded.
+    """
+    export = export_csv if output_format == "csv" else export_jsonl
+    temporary_file = file.with_name(f".{file.name}.tmp")
+    try:
+        # a savepoint keeps an explicit transaction usable when the database rejects the regular expression
+        with read_session().begin_nested():
+            number_of_subscriptions = export(export_rows(subscription_filter), temporary_file)
+        temporary_file.replace(file)
+    finally:
+        temporary_file.unlink(missing_ok=True)
+    return number_of_subscriptions
@@ -0,0 +1,68 @@
+# Copyright 2026 GÉANT.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from orchestrator.core.db import db
+from structlog import get_logger
+
+from orchestrator.shell.database import expire_read_only_objects
+from orchestrator.shell.state import state
+
+logger = get_logger(__name__)
+
+
+def in_transaction() -> bool:
+    """Return True when an explicit transaction was started with the 'begin' command.
+
+    While commit is disabled on the session, every `transactional` block is a no-op and all updates are staged in
+    the session until the transaction is committed or rolled back.
+    """
+    return db.session.is_commit_disabled()
+
+
+def transaction_begin() -> None:
+    """Implementation of the 'begin' command."""
+    db.session.disable_commit()
+    db.session.info["logger"] = logger
+
+
+def transaction_commit() -> None:
+    """Implementation of the 'commit' command."""
+    db.session.enable_commit()
+    try:
+        db.session.commit()
+    except Exception:
+        logger.warning("Rolling back transaction.")
+        db.session.rollback()
+        raise
+
+
+def transaction_rollback() -> None:
+    """Implementation of the 'rollback' command.
+
+    Objects read from the read-only database may show rolled back updates, they are reloaded when used again, and the
+    displayed values are captured again so later updates compare with the rolled back values.
+    """
+    db.session.enable_commit()
+    db.session.rollback()
+    expire_read_only_objects()
+    state.capture_displayed()
+
+
+def transaction_abort() -> bool:
+    """Roll back the session after a failed or cancelled statement, and return True if an explicit transaction was lost.
+
+    PostgreSQL aborts the whole transaction when a statement fails, so the session must be rolled back to be usable.
+    """
+    lost = in_transaction()
+    transaction_rollback()
+    return lost